@@ -0,0 +1,142 @@
+"""Compare TTS codecs: bytes on the wire, decode CPU and time to first audio
+
+Synthetic speech is encoded with each available codec, decoded with the
+TTS decoders and streamed by a local :class:`pynuance.testing.NuanceStubServer`.
+
+    python benchmarks/codec_benchmark.py --duration 10 --latency 0.05
+"""
+import argparse
+import asyncio
+import audioop
+import logging
+import math
+import time
+
+import numpy
+
+from pynuance import tts
+from pynuance.libs.common import CODECS
+from pynuance.testing import NuanceStubServer
+from pynuance.websocket import create_session
+
+
+FRAME_SAMPLES = 320  # 20 ms at 16 kHz
+OPUS_APPLICATION_VOIP = 2048
+
+
+def synthetic_speech(duration):
+    """Voiced-like 16 bits PCM: harmonics modulated at syllable rate, plus noise"""
+    times = numpy.arange(int(duration * tts.SAMPLE_RATE)) / tts.SAMPLE_RATE
+    pitch = 140 + 30 * numpy.sin(2 * math.pi * 0.5 * times)
+    phase = 2 * math.pi * numpy.cumsum(pitch) / tts.SAMPLE_RATE
+    signal = sum(numpy.sin(harmonic * phase) / harmonic for harmonic in range(1, 8))
+    envelope = 0.5 + 0.5 * numpy.sin(2 * math.pi * 4 * times) ** 2
+    noise = numpy.random.RandomState(0).normal(0, 0.05, len(times))
+    signal = (signal * envelope + noise) * 6000
+    return signal.astype('<i2').tobytes()
+
+
+def encode(codec, pcm):
+    """Split PCM in 20 ms frames encoded with a codec"""
+    frame_bytes = FRAME_SAMPLES * tts.SAMPLE_WIDTH
+    frames = [pcm[i:i + frame_bytes] for i in range(0, len(pcm) - frame_bytes + 1, frame_bytes)]
+    if codec == "speex":
+        encoder = tts.speex.WBEncoder()  # pylint: disable=E1101
+        return [encoder.encode(frame) for frame in frames]
+    elif codec == "opus":
+        encoder = tts.opus.encoder.create_state(tts.SAMPLE_RATE, tts.CHANNELS,
+                                                OPUS_APPLICATION_VOIP)
+        return [tts.opus.encoder.encode(encoder, frame, FRAME_SAMPLES, frame_bytes)
+                for frame in frames]
+    elif codec == "adpcm":
+        state = None
+        coded = []
+        for frame in frames:
+            data, state = audioop.lin2adpcm(frame, tts.SAMPLE_WIDTH, state)
+            coded.append(data)
+        return coded
+    return frames
+
+
+def wire_bytes(frames):
+    """Bytes of the websocket frames carrying the audio"""
+    total = 0
+    for frame in frames:
+        header = 2 if len(frame) < 126 else 4 if len(frame) < 65536 else 10
+        total += header + len(frame)
+    return total
+
+
+def decode_cpu(codec, frames, runs):
+    """CPU seconds to decode the frames, best of `runs`"""
+    audio_type = tts._get_audio_type(codec)  # pylint: disable=W0212
+    best = None
+    for _ in range(runs):
+        decoder_func = tts._get_decoder_func(audio_type)  # pylint: disable=W0212
+        start = time.process_time()
+        if decoder_func is not None:
+            for frame in frames:
+                decoder_func(frame)
+        elapsed = time.process_time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+@asyncio.coroutine
+def time_to_first_audio(loop, codec, frames, latency, runs):
+    """Mean seconds between the query and the first decoded chunk"""
+    server = NuanceStubServer(latency=latency, audio_frames=frames, loop=loop)
+    yield from server.start()
+    session = create_session(loop=loop)
+    logger = logging.getLogger("pynuance").getChild("benchmark")
+    total = 0
+    try:
+        for _ in range(runs):
+            synthesis = tts.SynthesisStream(server.url, server.app_id, server.app_key, "en_US",
+                                            "Allison", codec, "Hello", logger, session=session)
+            start = time.monotonic()
+            yield from synthesis.read()
+            total += time.monotonic() - start
+            while (yield from synthesis.read()) is not None:
+                pass
+    finally:
+        session.close()
+        yield from server.stop()
+    return total / runs
+
+
+def available(codec):
+    """Check if the module of a codec is installed"""
+    if codec == "speex":
+        return tts.speex is not None
+    elif codec == "opus":
+        return tts.opus is not None
+    return True
+
+
+def main():
+    """Run the benchmark and print a table"""
+    parser = argparse.ArgumentParser(description="TTS codec benchmark")
+    parser.add_argument('-D', '--duration', default=10, type=float, help='Seconds of audio')
+    parser.add_argument('-L', '--latency', default=0.05, type=float, help='Server latency (s)')
+    parser.add_argument('-r', '--runs', default=5, type=int, help='Runs by measure')
+    args = parser.parse_args()
+
+    pcm = synthetic_speech(args.duration)
+    loop = asyncio.get_event_loop()
+    print("{:<8}{:>14}{:>22}{:>12}".format("codec", "wire kbit/s", "decode CPU ms/s audio",
+                                           "TTFA ms"))
+    for codec in CODECS:
+        if not available(codec):
+            print("{:<8}{:>14}".format(codec, "not installed"))
+            continue
+        frames = encode(codec, pcm)
+        kbits = wire_bytes(frames) * 8 / 1000 / args.duration
+        cpu = decode_cpu(codec, frames, args.runs) * 1000 / args.duration
+        ttfa = loop.run_until_complete(time_to_first_audio(loop, codec, frames, args.latency,
+                                                           args.runs)) * 1000
+        print("{:<8}{:>14.1f}{:>22.3f}{:>12.1f}".format(codec, kbits, cpu, ttfa))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""Compare the multi-channel downmix with the former byte by byte loop
+
+    python benchmarks/downmix_benchmark.py --duration 10 --channels 2
+"""
+import argparse
+import os
+import timeit
+
+from pynuance.libs.audio import downmix
+
+
+def loop_downmix(rawaudio, channels):
+    """Former downmix of listen_microphone, kept one byte of each frame"""
+    procsamples = b''
+    for i in range(0, len(rawaudio), 2*channels):
+        procsamples += rawaudio[i:i+1]
+    return procsamples
+
+
+def main():
+    """Run the benchmark and print a table"""
+    parser = argparse.ArgumentParser(description="Downmix benchmark")
+    parser.add_argument('-D', '--duration', default=10, type=float, help='Seconds of audio')
+    parser.add_argument('-R', '--rate', default=44100, type=int, help='Sample rate')
+    parser.add_argument('-c', '--channels', default=2, type=int, help='Input channels')
+    parser.add_argument('-r', '--runs', default=5, type=int, help='Runs by measure')
+    args = parser.parse_args()
+
+    frame_bytes = 2 * args.channels
+    pcm = os.urandom(int(args.duration * args.rate) * frame_bytes)
+    # listen_microphone processes up to 1280 frames at once
+    chunk_bytes = 320 * 4 * frame_bytes
+    chunks = [pcm[i:i + chunk_bytes] for i in range(0, len(pcm), chunk_bytes)]
+
+    measures = (
+        ("loop", lambda: [loop_downmix(chunk, args.channels) for chunk in chunks]),
+        ("average", lambda: [downmix(chunk, args.channels) for chunk in chunks]),
+        ("select", lambda: [downmix(chunk, args.channels, 0) for chunk in chunks]),
+        ("average whole", lambda: downmix(pcm, args.channels)),
+    )
+    print("{:<16}{:>22}".format("downmix", "CPU ms/s audio"))
+    for name, func in measures:
+        best = min(timeit.repeat(func, number=1, repeat=args.runs))
+        print("{:<16}{:>22.3f}".format(name, best * 1000 / args.duration))
+
+
+if __name__ == '__main__':
+    main()
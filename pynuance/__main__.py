@@ -4,7 +4,7 @@ import sys
 
 from pynuance import cli
 
-from pynuance.libs.common import parse_credentials
+from pynuance.libs.common import CODECS, parse_credentials
 
 
 def main():  # pylint: disable=R0912,R0915
@@ -27,8 +27,15 @@ def main():  # pylint: disable=R0912,R0915
     parser_tts.add_argument('-c', '--credentials', required=True, help='Credential file')
     parser_tts.add_argument('-l', '--language', required=True, help='Language')
     parser_tts.add_argument('-v', '--voice', required=True, help='Voice')
-    parser_tts.add_argument('-d', '--codec', required=True, help='Codec')
-    parser_tts.add_argument('-t', '--text', required=True, help='Text')
+    parser_tts.add_argument('-d', '--codec', required=True, choices=CODECS, help='Codec')
+    parser_tts_input = parser_tts.add_mutually_exclusive_group(required=True)
+    parser_tts_input.add_argument('-t', '--text', help='Text')
+    parser_tts_input.add_argument('-i', '--input-file',
+                                  help='File of texts, one by line or JSON lines')
+    parser_tts.add_argument('-o', '--output-dir', default=".",
+                            help='Directory of WAV files (with --input-file)')
+    parser_tts.add_argument('-j', '--jobs', default=4, type=int,
+                            help='Concurrent syntheses (with --input-file)')
     # *STT
     parser_stt = subparsers.add_parser("stt", help="Speech To Text")
     parser_stt.add_argument('-c', '--credentials', required=True, help='Credential file')
@@ -172,7 +179,12 @@ def main():  # pylint: disable=R0912,R0915
     elif args.command == "tts":
         creds = parse_credentials(args.credentials)
         # Run TTS command
-        cli.text_to_speech(creds[0], creds[1], args.language, args.voice, args.codec, args.text)
+        if args.input_file is not None:
+            cli.text_to_speech_batch(creds[0], creds[1], args.language, args.voice, args.codec,
+                                     args.input_file, args.output_dir, args.jobs)
+        else:
+            cli.text_to_speech(creds[0], creds[1], args.language, args.voice, args.codec,
+                               args.text)
 
     elif args.command == "stt":
         creds = parse_credentials(args.credentials)
@@ -3,16 +3,15 @@
 import json
 import sys
 
-from pynuance import credentials
-from pynuance import mix
-from pynuance import nlu
-from pynuance import tts
-from pynuance import stt
 from pynuance.libs.error import PyNuanceError
 
+# Service modules pull heavy dependencies (aiohttp, PyAudio, requests...),
+# each command imports only the one it needs
+
 
 def save_cookies(cookies_file, username=None, password=None):
     """CLI function to save cookie on the disk."""
+    from pynuance import credentials
     credentials.save_cookies(cookies_file, username, password)
     print("Cookies saved in file {}".format(cookies_file))
 
@@ -22,6 +21,7 @@ def get_credentials(username=None, password=None, cookies_file=None, credential_
 
     Then show it or saved it in a file.
     """
+    from pynuance import credentials
     creds = credentials.get_credentials(username, password, cookies_file)
     if credential_file is None:
         print("App Id:  {}".format(creds["appId"]))
@@ -38,6 +38,7 @@ def mix_activated(username=None, password=None, cookies_file=None):
 
     URL: https://developer.nuance.com/mix/nlu/#/models/
     """
+    from pynuance import mix
     result = mix.mix_activated(username, password, cookies_file)
     if result:
         print("Your Mix account is activated, you can use NLU")
@@ -47,6 +48,7 @@ def mix_activated(username=None, password=None, cookies_file=None):
 
 def list_models(username=None, password=None, cookies_file=None):
     """Print all created models from Nuance Mix."""
+    from pynuance import mix
     models = mix.list_models(username, password, cookies_file)
     if not models:
         print("No model")
@@ -59,6 +61,7 @@ def list_models(username=None, password=None, cookies_file=None):
 
 def create_model(name, language, username=None, password=None, cookies_file=None):
     """Create a new model and print the result."""
+    from pynuance import mix
     try:
         model = mix.create_model(name, language, username, password, cookies_file)
     except PyNuanceError as exp:
@@ -69,6 +72,7 @@ def create_model(name, language, username=None, password=None, cookies_file=None
 
 def delete_model(name, username=None, password=None, cookies_file=None):
     """Delete a model and print the result."""
+    from pynuance import mix
     try:
         mix.delete_model(name, username, password, cookies_file)
     except PyNuanceError as exp:
@@ -79,6 +83,7 @@ def delete_model(name, username=None, password=None, cookies_file=None):
 
 def upload_model(name, model_file, username=None, password=None, cookies_file=None):
     """Upload intent file into a Mix model and print the result."""
+    from pynuance import mix
     try:
         mix.upload_model(name, model_file, username, password, cookies_file)
     except PyNuanceError as exp:
@@ -89,6 +94,7 @@ def upload_model(name, model_file, username=None, password=None, cookies_file=No
 
 def train_model(name, username=None, password=None, cookies_file=None):
     """Train a mode and print the result."""
+    from pynuance import mix
     try:
         mix.train_model(name, username, password, cookies_file)
     except PyNuanceError as exp:
@@ -99,6 +105,7 @@ def train_model(name, username=None, password=None, cookies_file=None):
 
 def model_build_create(name, notes="", username=None, password=None, cookies_file=None):
     """Create a new model build and print the result."""
+    from pynuance import mix
     try:
         mix.model_build_create(name, notes, username, password, cookies_file)
     except PyNuanceError as exp:
@@ -109,6 +116,7 @@ def model_build_create(name, notes="", username=None, password=None, cookies_fil
 
 def model_build_list(name, username=None, password=None, cookies_file=None):
     """List builds for a given model."""
+    from pynuance import mix
     try:
         builds = mix.model_build_list(name, username, password, cookies_file)
     except PyNuanceError as exp:
@@ -128,6 +136,7 @@ def model_build_list(name, username=None, password=None, cookies_file=None):
 def model_build_attach(name, build_version=None, context_tag="latest",
                        username=None, password=None, cookies_file=None):
     """Attach a build to the Sandbox App and print result."""
+    from pynuance import mix
     try:
         mix.model_build_attach(name, build_version, context_tag, username, password, cookies_file)
     except PyNuanceError as exp:
@@ -143,6 +152,7 @@ def model_build_attach(name, build_version=None, context_tag="latest",
 
 def nlu_text(app_id, app_key, context_tag, language, text):
     """Try to understand a text and print the result."""
+    from pynuance import nlu
     try:
         result = nlu.understand_text(app_id, app_key, context_tag, language, text)
     except PyNuanceError as exp:
@@ -153,6 +163,7 @@ def nlu_text(app_id, app_key, context_tag, language, text):
 
 def nlu_audio(app_id, app_key, context_tag, language):
     """Try to understand audio from microphone and print the result."""
+    from pynuance import nlu
     try:
         result = nlu.understand_audio(app_id, app_key, context_tag, language)
     except PyNuanceError as exp:
@@ -163,6 +174,7 @@ def nlu_audio(app_id, app_key, context_tag, language):
 
 def text_to_speech(app_id, app_key, lang, voice, codec, text):
     """Read a text with a given language, voice and code and print result."""
+    from pynuance import tts
     try:
         tts.text_to_speech(app_id, app_key, lang, voice, codec, text)
     except PyNuanceError as exp:
@@ -171,8 +183,56 @@ def text_to_speech(app_id, app_key, lang, voice, codec, text):
     print('Text "{}" should be said'.format(text))
 
 
+def _read_tts_jobs(input_file, lang, voice):
+    """Read (text, voice, language) jobs from a file
+
+    Each line is either a text or a JSON object with a `text` and optional
+    `voice` and `language`. Raise PyNuanceError on the first bad line.
+    """
+    jobs = []
+    with open(input_file) as f_input:
+        for number, line in enumerate(f_input, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if not line.startswith("{"):
+                jobs.append((line, voice, lang))
+                continue
+            try:
+                job = json.loads(line)
+            except ValueError as exp:
+                raise PyNuanceError("{}:{}: bad JSON: {}".format(input_file, number, exp))
+            if not isinstance(job, dict) or not isinstance(job.get("text"), str):
+                raise PyNuanceError("{}:{}: missing text".format(input_file, number))
+            jobs.append((job["text"], job.get("voice", voice), job.get("language", lang)))
+    return jobs
+
+
+def text_to_speech_batch(app_id, app_key, lang, voice,  # pylint: disable=R0913
+                         codec, input_file, output_dir, concurrency=4):
+    """Write the speech of each text of a file in WAV files and print results."""
+    from pynuance import tts
+    try:
+        jobs = _read_tts_jobs(input_file, lang, voice)
+        results = tts.synthesize_batch(app_id, app_key, codec, jobs, output_dir, concurrency)
+    except (PyNuanceError, OSError, ValueError) as exp:
+        print("Error: {}".format(exp))
+        sys.exit(1)
+    errors = 0
+    for result in results:
+        if "error" in result:
+            errors += 1
+            print('Error: "{}": {}'.format(result["text"], result["error"]))
+        else:
+            print('{} {:.3f}s "{}"'.format(result["file"], result["latency"], result["text"]))
+    print("{} texts said, {} errors".format(len(results) - errors, errors))
+    if errors:
+        sys.exit(1)
+
+
 def speech_to_text(app_id, app_key, language, all_=False, raw=False):
     """Speech to text from mic and print result."""
+    from pynuance import stt
     try:
         result = stt.speech_to_text(app_id, app_key, language)
     except PyNuanceError as exp:
@@ -0,0 +1,347 @@
+"""Provides the encoding of audio sent to Nuance"""
+import asyncio
+import audioop
+import concurrent.futures
+import time
+
+try:
+    import speex
+except ImportError:
+    speex = None
+
+
+class RingBuffer(object):
+    """Preallocated FIFO of bytes
+
+    :meth:`read` returns a memoryview of the buffer, valid until the next
+    :meth:`write`, so data is not copied again and again while it waits.
+    The buffer only grows if more than `capacity` bytes wait at once.
+    """
+
+    def __init__(self, capacity):
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._scratch = bytearray()
+        self._start = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self):
+        """Bytes the buffer can hold without growing"""
+        return len(self._buffer)
+
+    def write(self, data):
+        """Append bytes"""
+        data = memoryview(data).cast('B')
+        count = len(data)
+        if self._size + count > len(self._buffer):
+            self._grow(self._size + count)
+        capacity = len(self._buffer)
+        end = (self._start + self._size) % capacity
+        first = min(count, capacity - end)
+        self._view[end:end + first] = data[:first]
+        self._view[:count - first] = data[first:]
+        self._size += count
+
+    def read(self, count):
+        """Consume `count` bytes and return them as a memoryview"""
+        count = min(count, self._size)
+        capacity = len(self._buffer)
+        start = self._start
+        if start + count <= capacity:
+            data = self._view[start:start + count]
+        else:
+            # Wrapped around the end, join both parts in the scratch buffer
+            if len(self._scratch) < count:
+                self._scratch = bytearray(count)
+            first = capacity - start
+            scratch = memoryview(self._scratch)
+            scratch[:first] = self._view[start:]
+            scratch[first:count] = self._view[:count - first]
+            data = scratch[:count]
+        self._start = (start + count) % capacity
+        self._size -= count
+        return data
+
+    def peek(self):
+        """Get a copy of all waiting bytes without consuming them"""
+        end = self._start + self._size
+        if end <= len(self._buffer):
+            return bytes(self._view[self._start:end])
+        return bytes(self._view[self._start:]) + bytes(self._view[:end - len(self._buffer)])
+
+    def _grow(self, size):
+        """Reallocate to hold at least `size` bytes"""
+        capacity = max(size, 2 * len(self._buffer))
+        pending = bytes(self.read(self._size))
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._view[:len(pending)] = pending
+        self._start = 0
+        self._size = len(pending)
+
+
+# Overflow policies of AudioQueue
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+BLOCK = "block"
+OVERFLOW_POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+
+class AudioQueue(object):
+    """Bounded queue of captured audio buffers
+
+    When the queue is full, `overflow` drops the oldest buffer, drops the
+    new one or, with BLOCK, makes the capture thread wait for the consumer.
+    A PortAudio callback must never wait, BLOCK needs a reading thread.
+    `dropped` counts the dropped buffers and `max_depth` the highest depth.
+    """
+
+    def __init__(self, maxsize=64, overflow=DROP_OLDEST, loop=None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError("Bad overflow policy: {}. Choose one of {}"
+                             "".format(overflow, ", ".join(OVERFLOW_POLICIES)))
+        self.loop = loop if loop is not None else asyncio.get_event_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize, loop=self.loop)
+        self.overflow = overflow
+        self.dropped = 0
+        self.max_depth = 0
+
+    @property
+    def depth(self):
+        """Buffers waiting in the queue"""
+        return self.queue.qsize()
+
+    def put_nowait(self, audio):
+        """Queue a buffer, drop one if the queue is full"""
+        if self.queue.full():
+            self.dropped += 1
+            if self.overflow == DROP_NEWEST:
+                return
+            self.queue.get_nowait()
+        self.queue.put_nowait(audio)
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    @asyncio.coroutine
+    def put(self, audio):
+        """Queue a buffer, wait for room with BLOCK"""
+        if self.overflow == BLOCK:
+            yield from self.queue.put(audio)
+            self.max_depth = max(self.max_depth, self.queue.qsize())
+        else:
+            self.put_nowait(audio)
+
+    def put_threadsafe(self, audio, stopped=None):
+        """Queue a buffer from another thread
+
+        With BLOCK, wait until the buffer is queued or the `stopped`
+        :class:`threading.Event` is set, without needing the event loop to
+        run. Return False if the buffer was not queued.
+        """
+        if self.overflow != BLOCK:
+            self.loop.call_soon_threadsafe(self.put_nowait, audio)
+            return True
+        future = asyncio.run_coroutine_threadsafe(self.put(audio), self.loop)
+        while True:
+            try:
+                future.result(0.1)
+                return True
+            except concurrent.futures.TimeoutError:
+                if stopped is not None and stopped.is_set():
+                    future.cancel()
+                    return False
+
+    def drop(self):
+        """Count a buffer lost before being queued"""
+        self.dropped += 1
+
+    @asyncio.coroutine
+    def get(self):
+        """Get the oldest buffer"""
+        return (yield from self.queue.get())
+
+
+def downmix(data, channels, channel=None):
+    """Convert interleaved 16 bits PCM to mono
+
+    Keep only `channel` if it is set, else average all channels.
+    `data` must hold whole frames.
+    """
+    if channels == 1:
+        return bytes(data)
+    if channel is not None:
+        return memoryview(data).cast('h')[channel::channels].tobytes()
+    if channels == 2:
+        return audioop.tomono(data, 2, 0.5, 0.5)
+    samples = memoryview(data).cast('h')
+    mono = None
+    for index in range(channels):
+        part = audioop.mul(samples[index::channels].tobytes(), 2, 1 / channels)
+        mono = part if mono is None else audioop.add(mono, part, 2)
+    return mono
+
+
+class SpeexEncoder(object):
+    """Downmix, resample and encode 16 bits PCM to wide band Speex frames
+
+    Raw PCM is given with :meth:`feed`, :meth:`encode` returns the frames
+    ready to be sent. Audio waits in ring buffers sized for one second, so
+    long captures are processed in linear time and fixed memory.
+    Multi-channel audio is averaged, or only `channel` is kept if it is set.
+    `timings` holds the seconds spent in each stage.
+    """
+
+    def __init__(self, rate, channels, channel=None):
+        self.rate = rate
+        self.channels = channels
+        self.channel = channel
+        self.encoder = speex.WBEncoder()  # pylint: disable=E1101
+        self.resampler = None
+        # The wide band encoder takes 16 kHz audio, whatever the input rate
+        if rate != 16000:
+            self.resampler = speex.SpeexResampler(1, rate, 16000)  # pylint: disable=E1101
+        # Raw PCM waiting to be processed
+        self.rawaudio = RingBuffer(rate * channels * 2)
+        # Mono PCM waiting to be encoded
+        self.audio = RingBuffer(16000 * 2)
+        self.timings = {"downmix": 0.0,
+                        "resample": 0.0,
+                        "encode": 0.0,
+                        }
+
+    def feed(self, rawaudio):
+        """Add raw PCM"""
+        self.rawaudio.write(rawaudio)
+
+    def pending_audio(self):
+        """Get the processed PCM not encoded yet (less than a frame)"""
+        return self.audio.peek()
+
+    def encode(self):
+        """Process the raw PCM and return the encoded frames"""
+        return [coded for _, coded in self.frames()]
+
+    def frames(self):
+        """Process the raw PCM and yield the (PCM, encoded) frames"""
+        channels = self.channels
+        while len(self.rawaudio) > 320*channels*2:
+            count = min(len(self.rawaudio), 320*4*channels*2)
+            # Whole frames only
+            count -= count % (2*channels)
+            rawaudio = self.rawaudio.read(count)
+
+            start = time.perf_counter()
+            if channels > 1:
+                procsamples = downmix(rawaudio, channels, self.channel)
+            else:
+                procsamples = rawaudio
+            resampled = time.perf_counter()
+            self.timings["downmix"] += resampled - start
+
+            if self.resampler:
+                self.audio.write(self.resampler.process(bytes(procsamples)))
+                self.timings["resample"] += time.perf_counter() - resampled
+            else:
+                self.audio.write(procsamples)
+
+        frame_bytes = self.encoder.frame_size*2
+        while len(self.audio) > frame_bytes:
+            # The Speex binding takes bytes, each frame is copied once
+            frame = bytes(self.audio.read(frame_bytes))
+            start = time.perf_counter()
+            coded = self.encoder.encode(frame)
+            self.timings["encode"] += time.perf_counter() - start
+            yield frame, coded
+
+
+class EncoderStage(object):
+    """Run a SpeexEncoder out of the event loop
+
+    :meth:`run` reads PCM chunks, encodes them in `executor` (the default
+    executor if None) and queues the (PCM, encoded) frames for :meth:`get`,
+    so the codec CPU does not delay the other coroutines. The encoder is
+    only used by one worker at a time.
+
+    `timings` holds the seconds spent waiting for the executor (including
+    the encoding) and waiting for room in the frame queue.
+    """
+
+    def __init__(self, encoder, executor=None, loop=None, maxsize=64):
+        self.encoder = encoder
+        self.executor = executor
+        self.loop = loop if loop is not None else asyncio.get_event_loop()
+        self.frames = asyncio.Queue(maxsize=maxsize, loop=self.loop)
+        self.finished = False
+        self.timings = {"executor": 0.0,
+                        "queue": 0.0,
+                        "chunks": 0,
+                        }
+
+    def _encode(self, chunk):
+        """Encode a chunk, in the executor"""
+        self.encoder.feed(chunk)
+        return list(self.encoder.frames())
+
+    @asyncio.coroutine
+    def encode(self, chunk):
+        """Encode a chunk out of the event loop and return the frames"""
+        start = self.loop.time()
+        frames = yield from self.loop.run_in_executor(self.executor, self._encode, chunk)
+        self.timings["executor"] += self.loop.time() - start
+        self.timings["chunks"] += 1
+        return frames
+
+    @asyncio.coroutine
+    def run(self, chunks):
+        """Encode an async iterator of PCM chunks"""
+        iterator = chunks.__aiter__()
+        try:
+            while True:
+                try:
+                    chunk = yield from iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+                for frame in (yield from self.encode(chunk)):
+                    start = self.loop.time()
+                    yield from self.frames.put(frame)
+                    self.timings["queue"] += self.loop.time() - start
+        finally:
+            self.finished = True
+            if not self.frames.full():
+                self.frames.put_nowait(None)
+
+    @asyncio.coroutine
+    def get(self):
+        """Get the next (PCM, encoded) frame, None once :meth:`run` ended"""
+        if self.finished and self.frames.empty():
+            return None
+        return (yield from self.frames.get())
+
+
+@asyncio.coroutine
+def send_pcm_stream(client, chunks, rate, channels, executor=None):
+    """Encode and send PCM chunks as fast as the websocket accepts them
+
+    `chunks` is an async iterator of raw 16 bits PCM, the sending only
+    waits when the websocket write buffer is full. The encoding runs in
+    `executor`, see :class:`EncoderStage`.
+    """
+    stage = EncoderStage(SpeexEncoder(rate, channels), executor)
+    task = asyncio.ensure_future(stage.run(chunks), loop=stage.loop)
+    try:
+        while True:
+            frame = yield from stage.get()
+            if frame is None:
+                break
+            yield from client.write_audio(frame[1])
+    finally:
+        if not task.done():
+            task.cancel()
+    # Raise the errors of the chunks
+    yield from task
+    # Flush the last samples with 100 ms of silence
+    for _, coded in (yield from stage.encode(bytes(2 * channels * (rate // 10)))):
+        yield from client.write_audio(coded)
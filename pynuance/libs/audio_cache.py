@@ -0,0 +1,139 @@
+"""Provides a two-tier cache of synthesized speech"""
+import collections
+import hashlib
+import os
+
+
+class AudioCache(object):  # pylint: disable=R0902
+    """PCM of synthesized texts, in memory then on the disk
+
+    Entries are addressed by a hash of the language, voice, codec and text.
+    The memory tier keeps the most recently used entries up to
+    `max_memory_bytes`. If `directory` is set, entries are also written
+    there as `.pcm` files and the least recently used files are removed
+    once they take more than `max_disk_bytes`.
+
+    :param int max_memory_bytes: Size limit of the memory tier
+    :param str directory: Optional directory of the disk tier
+    :param int max_disk_bytes: Size limit of the disk tier
+    """
+
+    def __init__(self, max_memory_bytes=32 * 1024 * 1024, directory=None,
+                 max_disk_bytes=512 * 1024 * 1024):
+        self.max_memory_bytes = max_memory_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.stats = {"memory_hits": 0,
+                      "disk_hits": 0,
+                      "misses": 0,
+                      }
+        self._memory = collections.OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+
+    @staticmethod
+    def key(language, voice, codec, text):
+        """Get the cache key of a synthesis"""
+        value = "\0".join((language, voice, codec, text)).encode('utf-8')
+        return hashlib.sha256(value).hexdigest()
+
+    def get(self, key):
+        """Get the PCM of an entry or None if it is not cached"""
+        audio = self._memory.get(key)
+        if audio is not None:
+            self._memory.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            return audio
+        audio = self._read_file(key)
+        if audio is not None:
+            self.stats["disk_hits"] += 1
+            self._memory_set(key, audio)
+            return audio
+        self.stats["misses"] += 1
+        return None
+
+    def set(self, key, audio):
+        """Store the PCM of an entry in both tiers"""
+        self._memory_set(key, audio)
+        if self.directory is not None:
+            self._write_file(key, audio)
+
+    def __contains__(self, key):
+        if key in self._memory:
+            return True
+        return self.directory is not None and os.path.isfile(self._file_path(key))
+
+    def clear(self):
+        """Remove all entries"""
+        self._memory = collections.OrderedDict()
+        self._memory_bytes = 0
+        if self.directory is not None:
+            for path, _, _ in self._disk_entries():
+                os.remove(path)
+            self._disk_bytes = 0
+
+    def _memory_set(self, key, audio):
+        """Store an entry in memory and evict the least recently used ones"""
+        if len(audio) > self.max_memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = audio
+        self._memory_bytes += len(audio)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _file_path(self, key):
+        """Path of the file of an entry"""
+        return os.path.join(self.directory, key + ".pcm")
+
+    def _disk_entries(self):
+        """List (path, size, last use) of the files of the disk tier"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pcm") and entry.is_file():
+                stat = entry.stat()
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _read_file(self, key):
+        """Read an entry from the disk"""
+        if self.directory is None:
+            return None
+        path = self._file_path(key)
+        try:
+            with open(path, "rb") as f_audio:
+                audio = f_audio.read()
+        except OSError:
+            return None
+        # mtime is the last use for the eviction
+        os.utime(path)
+        return audio
+
+    def _write_file(self, key, audio):
+        """Write an entry on the disk and evict the least recently used files"""
+        path = self._file_path(key)
+        if os.path.isfile(path):
+            self._disk_bytes -= os.path.getsize(path)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f_audio:
+            f_audio.write(audio)
+        os.replace(tmp_path, path)
+        self._disk_bytes += len(audio)
+        if self._disk_bytes > self.max_disk_bytes:
+            self._evict_files()
+
+    def _evict_files(self):
+        """Remove the least recently used files until the disk tier fits"""
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[2])
+        self._disk_bytes = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            os.remove(path)
+            self._disk_bytes -= size
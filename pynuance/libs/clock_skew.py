@@ -0,0 +1,70 @@
+"""Provides a cache of the clock delta between the client and Nuance servers"""
+import datetime
+import json
+import os
+import time
+
+
+class ClockSkewCache(object):
+    """Clock delta measured by endpoint
+
+    Signed (HMAC) connections need the server date. Once measured from a
+    401 response, the delta is kept here so next connections are signed
+    right at the first request.
+
+    :param str file_path: Optional JSON file where deltas are persisted
+    :param float ttl: Seconds a measured delta stays valid
+    """
+
+    def __init__(self, file_path=None, ttl=3600):
+        self.file_path = file_path
+        self.ttl = ttl
+        # url -> (delta in seconds, measured at timestamp)
+        self._deltas = {}
+        if file_path is not None:
+            self._load()
+
+    def get(self, url):
+        """Get the delta of an endpoint as a timedelta or None if unknown or expired"""
+        entry = self._deltas.get(url)
+        if entry is None:
+            return None
+        seconds, measured_at = entry
+        if time.time() - measured_at > self.ttl:
+            del self._deltas[url]
+            return None
+        return datetime.timedelta(seconds=seconds)
+
+    def set(self, url, delta):
+        """Store the delta measured for an endpoint"""
+        self._deltas[url] = (delta.total_seconds(), time.time())
+        if self.file_path is not None:
+            self._save()
+
+    def clear(self):
+        """Forget all deltas"""
+        self._deltas = {}
+        if self.file_path is not None:
+            self._save()
+
+    def _load(self):
+        """Load deltas from the disk"""
+        if not os.path.isfile(self.file_path):
+            return
+        try:
+            with open(self.file_path) as f_skew:
+                self._deltas = {url: tuple(entry) for url, entry in json.load(f_skew).items()}
+        except (OSError, ValueError):
+            # A broken cache file only costs one more round trip
+            self._deltas = {}
+
+    def _save(self):
+        """Write deltas on the disk"""
+        tmp_path = self.file_path + ".tmp"
+        with open(tmp_path, "w") as f_skew:
+            json.dump(self._deltas, f_skew)
+        os.replace(tmp_path, self.file_path)
+
+
+# In memory cache shared by all connections
+CLOCK_SKEW_CACHE = ClockSkewCache()
@@ -1,9 +1,10 @@
+import asyncio
 import json
 
 from pynuance.libs.error import PyNuanceError
 
 
-CODECS = ('wav', 'speex', 'opus')
+CODECS = ('wav', 'speex', 'opus', 'adpcm')
 
 
 def parse_credentials(file_path):
@@ -15,3 +16,13 @@ def parse_credentials(file_path):
                 raise PyNuanceError("Missing {} in credentials file".format(attr))
 
         return cred_json["appId"], cred_json["appKey"], cred_json.get("context_tag")
+
+
+def get_event_loop():
+    """Get the event loop of the current thread, create it if needed"""
+    try:
+        loop = asyncio.get_event_loop()
+    except RuntimeError:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+    return loop
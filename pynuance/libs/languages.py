@@ -1,4 +1,10 @@
 # -*- coding: utf-8 -*-
+"""Provides the languages and voices of Nuance services"""
+import collections
+import types
+
+from pynuance.libs.error import PyNuanceError
+
 
 LANGUAGES = {
   "Arabic": {
@@ -427,3 +433,88 @@ NLU_LANGUAGES = {
     "ko_KR": "kor-KOR",
 }
 #    "en_GB": "eng-???
+
+
+Voice = collections.namedtuple("Voice", ("name", "gender", "language"))
+Language = collections.namedtuple("Language", ("name", "code", "voices", "nlu_code"))
+
+
+class LanguageCatalog(object):
+    """Read-only indexes of the language tables
+
+    Built once from `LANGUAGES` and `NLU_LANGUAGES`, lookups by locale
+    code, display name, voice name and gender are dict accesses and the
+    validation error messages are ready to raise.
+    """
+
+    def __init__(self, languages, nlu_languages):
+        by_code = {}
+        by_name = {}
+        by_voice = {}
+        by_gender = {}
+        for name, info in sorted(languages.items()):
+            code = info["code"]
+            voices = tuple(Voice(voice, gender, code)
+                           for voice, gender in zip(info["voice"], info["gender"]))
+            language = Language(name, code, voices, nlu_languages.get(code))
+            by_code[code] = language
+            by_name[name] = language
+            for voice in voices:
+                by_voice.setdefault(voice.name, []).append(voice)
+                by_gender.setdefault(voice.gender, []).append(voice)
+
+        self._by_code = types.MappingProxyType(by_code)
+        self._by_name = types.MappingProxyType(by_name)
+        self._by_voice = types.MappingProxyType({name: tuple(voices)
+                                                 for name, voices in by_voice.items()})
+        self._by_gender = types.MappingProxyType({gender: tuple(voices)
+                                                  for gender, voices in by_gender.items()})
+        self._voice_names = types.MappingProxyType({
+            code: frozenset(voice.name for voice in language.voices)
+            for code, language in by_code.items()})
+        self._nlu_codes = types.MappingProxyType(dict(nlu_languages))
+
+        self.codes = tuple(sorted(by_code))
+        self.nlu_codes = tuple(sorted(nlu_languages))
+        self._language_error = "Language should be in {}".format(", ".join(self.codes))
+        self._nlu_language_error = "Language should be in {}".format(", ".join(self.nlu_codes))
+        self._voice_errors = types.MappingProxyType({
+            code: "Voice should be in {}".format(", ".join(voice.name for voice in voices))
+            for code, (_, _, voices, _) in by_code.items()})
+
+    def language(self, code):
+        """Get a :class:`Language` by locale code (`en_US`), None if unknown"""
+        return self._by_code.get(code)
+
+    def language_by_name(self, name):
+        """Get a :class:`Language` by display name (`US English`), None if unknown"""
+        return self._by_name.get(name)
+
+    def voices(self, name):
+        """Get the :class:`Voice` tuple of a voice name, several languages can share it"""
+        return self._by_voice.get(name, ())
+
+    def voices_by_gender(self, gender):
+        """Get the :class:`Voice` tuple of a gender (`F` or `M`)"""
+        return self._by_gender.get(gender, ())
+
+    def check_language(self, code):
+        """Raise an error if the locale code has no TTS language"""
+        if code not in self._by_code:
+            raise PyNuanceError(self._language_error)
+
+    def check_voice(self, code, voice):
+        """Raise an error if the voice is not available in the language"""
+        self.check_language(code)
+        if voice not in self._voice_names[code]:
+            raise PyNuanceError(self._voice_errors[code])
+
+    def nlu_language(self, code):
+        """Translate a locale code to the NLU one (`en_US` to `eng-USA`)"""
+        nlu_code = self._nlu_codes.get(code)
+        if nlu_code is None:
+            raise PyNuanceError(self._nlu_language_error)
+        return nlu_code
+
+
+CATALOG = LanguageCatalog(LANGUAGES, NLU_LANGUAGES)
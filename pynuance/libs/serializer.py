@@ -0,0 +1,49 @@
+"""Provides the JSON serializer used on the websocket message path
+
+The fastest JSON library installed is used: `orjson`, then `ujson`, then
+the standard :mod:`json` module. Another serializer can be given to each
+connection or set as :data:`DEFAULT_SERIALIZER`.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+class JsonSerializer(object):  # pylint: disable=R0903
+    """Pair of JSON encode/decode functions
+
+    :param dumps: Function encoding an object to `str` or UTF-8 `bytes`
+    :param loads: Function decoding `str` or `bytes` to an object
+    :param str name: Name of the library, for logs
+    """
+
+    def __init__(self, dumps, loads, name):
+        self.dumps = dumps
+        self.loads = loads
+        self.name = name
+
+    def __repr__(self):
+        return "<JsonSerializer {}>".format(self.name)
+
+
+def _ujson_dumps(obj):
+    """Encode with ujson, keeping slashes of audio types as is"""
+    return ujson.dumps(obj, escape_forward_slashes=False)
+
+
+STDLIB_SERIALIZER = JsonSerializer(json.dumps, json.loads, "json")
+
+if orjson is not None:
+    DEFAULT_SERIALIZER = JsonSerializer(orjson.dumps, orjson.loads, "orjson")
+elif ujson is not None:
+    DEFAULT_SERIALIZER = JsonSerializer(_ujson_dumps, ujson.loads, "ujson")
+else:
+    DEFAULT_SERIALIZER = STDLIB_SERIALIZER
@@ -0,0 +1,92 @@
+"""Provides voice activity detection to end the listening of the microphone
+
+A detector is any object with a ``process(frame)`` method taking 16 bits mono
+PCM frames in order and returning:
+
+* None: the user is speaking or we are waiting for it
+* True: the user had finished to speak
+* False: the user did NOT speak
+"""
+import audioop
+
+
+# Level under which a frame is always silent
+MIN_LEVEL = 500
+
+
+class EnergyVad(object):  # pylint: disable=R0902
+    """Energy based detector with an adaptive noise floor
+
+    The noise floor is first measured over `calibration_ms`. Then a frame is
+    speech if its RMS is `ratio` times above the noise floor and above
+    `min_level`, and the noise floor follows the level of silent frames,
+    quickly when it gets quieter, slowly when it gets louder. Speech starts
+    after `start_ms` of consecutive speech frames and ends after `hangover_ms`
+    of silence. If the user did not start to speak after `timeout_ms`, the
+    detection ends.
+
+    Each frame is processed in constant time and memory.
+
+    :param int frame_ms: Duration of a frame
+    :param int calibration_ms: Initial measure of the noise floor
+    :param float ratio: Speech to noise floor ratio
+    :param int min_level: Level under which a frame is always silent
+    :param int start_ms: Speech needed to start
+    :param int hangover_ms: Silence needed to end
+    :param int timeout_ms: Wait for the user to speak
+    """
+
+    def __init__(self, frame_ms=20, calibration_ms=100, ratio=3.0,  # pylint: disable=R0913
+                 min_level=MIN_LEVEL, start_ms=100, hangover_ms=500, timeout_ms=2500):
+        self.calibration_frames = calibration_ms // frame_ms
+        self.ratio = ratio
+        self.min_level = min_level
+        self.start_frames = max(1, start_ms // frame_ms)
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.timeout_frames = max(1, timeout_ms // frame_ms)
+        self.noise_floor = 0
+        self.speaking = False
+        self._calibrated_frames = 0
+        self._frames = 0
+        self._speech_frames = 0
+        self._silent_frames = 0
+
+    def reset(self):
+        """Wait for a new utterance, keep the noise floor"""
+        self.speaking = False
+        self._frames = 0
+        self._speech_frames = 0
+        self._silent_frames = 0
+
+    def is_speech(self, frame):
+        """Classify a frame and update the noise floor"""
+        level = audioop.rms(frame, 2)
+        if self._calibrated_frames < self.calibration_frames:
+            # Mean level of the first frames
+            self._calibrated_frames += 1
+            self.noise_floor += (level - self.noise_floor) / self._calibrated_frames
+            return False
+        speech = level > self.min_level and level > self.noise_floor * self.ratio
+        if not speech:
+            if level < self.noise_floor:
+                self.noise_floor += 0.5 * (level - self.noise_floor)
+            else:
+                self.noise_floor += 0.05 * (level - self.noise_floor)
+        return speech
+
+    def process(self, frame):
+        """Process the next frame, see the module documentation for the result"""
+        speech = self.is_speech(frame)
+        if not self.speaking:
+            self._frames += 1
+            self._speech_frames = self._speech_frames + 1 if speech else 0
+            if self._speech_frames >= self.start_frames:
+                self.speaking = True
+                self._silent_frames = 0
+            elif self._frames >= self.timeout_frames:
+                return False
+            return None
+        self._silent_frames = 0 if speech else self._silent_frames + 1
+        if self._silent_frames >= self.hangover_frames:
+            return True
+        return None
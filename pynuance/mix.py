@@ -6,7 +6,7 @@ import requests
 from bs4 import BeautifulSoup
 
 from pynuance.libs.nuance_http import nuance_login
-from pynuance.libs.languages import LANGUAGES
+from pynuance.libs.languages import CATALOG
 from pynuance.libs.error import PyNuanceError
 
 
@@ -53,10 +53,11 @@ def create_model(name, language,
                  username=None, password=None, cookies_file=None):  # pylint: disable=W0613
     """Create a new model in Nuance Mix."""
     # Check language
-    voices_by_lang = dict([(l['code'], l['voice']) for l in LANGUAGES.values()])
-    if language not in voices_by_lang:
+    try:
+        CATALOG.check_language(language)
+    except PyNuanceError:
         raise PyNuanceError("Error: language should be in "
-                            "{}".format(', '.join(voices_by_lang.keys())))
+                            "{}".format(', '.join(CATALOG.codes)))
     # First request
     data = {"name": name,
             "domains": [],
@@ -6,41 +6,49 @@ import logging
 
 import aiohttp
 
-from pynuance.websocket import WebsocketConnection, connection_handshake
-from pynuance.libs.languages import NLU_LANGUAGES
+from pynuance.websocket import (acquire_client, release_client, connection_handshake,
+                                PrewarmedClient)
+from pynuance.libs.common import get_event_loop
+from pynuance.libs.languages import CATALOG
 from pynuance.libs.error import PyNuanceError
-from pynuance.recorder import Recorder, listen_microphone
 
 
-def understand_audio(app_id, app_key, context_tag, language, logger=None):
-    """NLU audio wrapper"""
-    # transform language
+@asyncio.coroutine
+def async_understand_audio(app_id, app_key, context_tag, language,  # pylint: disable=R0913
+                           logger=None, pool=None, session=None, recorder=None, loop=None,
+                           prewarm=False):
+    """Coroutine trying to understand audio from the microphone
+
+    A :class:`pynuance.recorder.Recorder` is opened if `recorder` is None.
+    See :func:`_nlu_audio` for `prewarm`.
+    """
     if logger is None:
         logger = logging.getLogger("pynuance").getChild("nlu").getChild("audio")
-    nlu_language = NLU_LANGUAGES.get(language)
-    if nlu_language is None:
-        raise PyNuanceError("Language should be in "
-                            "{}".format(", ".join(NLU_LANGUAGES.keys())))
-
-    try:
+    # transform language
+    nlu_language = CATALOG.nlu_language(language)
+    if loop is None:
         loop = asyncio.get_event_loop()
-    except RuntimeError:
-        logger.debug("Get New event loop")
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-
-    interpretations = {}
-    with Recorder(loop=loop) as recorder:
-        interpretations = loop.run_until_complete(_nlu_audio(
-            loop,
-            "https://ws.dev.nuance.com",
-            app_id,
-            binascii.unhexlify(app_key),
-            context_tag,
-            nlu_language,
-            recorder=recorder,
-            logger=logger,))
-    # loop.close()
+
+    if recorder is None:
+        # PyAudio is only needed for audio, not for text
+        from pynuance.recorder import Recorder
+        with Recorder(loop=loop) as recorder:
+            return (yield from async_understand_audio(app_id, app_key, context_tag, language,
+                                                      logger, pool, session, recorder, loop,
+                                                      prewarm))
+
+    interpretations = yield from _nlu_audio(
+        loop,
+        "https://ws.dev.nuance.com",
+        app_id,
+        binascii.unhexlify(app_key),
+        context_tag,
+        nlu_language,
+        recorder=recorder,
+        logger=logger,
+        pool=pool,
+        session=session,
+        prewarm=prewarm,)
     if interpretations is False:
         # The user did not speak
         return {}
@@ -48,55 +56,80 @@ def understand_audio(app_id, app_key, context_tag, language, logger=None):
     return interpretations
 
 
-@asyncio.coroutine
-def _nlu_audio(loop, url, app_id, app_key, context_tag,  # pylint: disable=R0914
-               language, recorder, logger):
-    """Trying to understand audio"""
-    # Websocket client
-    client = WebsocketConnection(url, logger)
-    yield from client.connect(app_id, app_key)
-
-    # Init Nuance communication
-    audio_type = 'audio/x-speex;mode=wb'
-    client.send_message({
-        'message': 'connect',
-        'device_id': '55555500000000000000000000000000',
-        'codec': audio_type
-    })
+def understand_audio(app_id, app_key, context_tag, language,  # pylint: disable=R0913
+                     logger=None, pool=None, loop=None, prewarm=False):
+    """NLU audio wrapper"""
+    if loop is None:
+        loop = get_event_loop()
+    return loop.run_until_complete(async_understand_audio(app_id, app_key, context_tag,
+                                                          language, logger=logger, pool=pool,
+                                                          loop=loop, prewarm=prewarm))
 
-    _, msg = yield from client.receive()
 
-    # logger.debug(msg)  # Should be a connected message
+@asyncio.coroutine
+def _begin_nlu_audio(url, app_id, app_key, context_tag,  # pylint: disable=R0913
+                     language, logger, pool=None, session=None):
+    """Connect and start a NLU audio query, return its (client, transaction)"""
+    # Websocket client and Nuance communication
+    audio_type = 'audio/x-speex;mode=wb'
+    client = yield from acquire_client(pool, url, app_id, app_key, audio_type, logger,
+                                       device_id='55555500000000000000000000000000',
+                                       session=session)
 
+    transaction = client.begin_transaction()
     client.send_message({
         'message': 'query_begin',
-        'transaction_id': 123,
+        'transaction_id': transaction.transaction_id,
 
         'command': 'NDSP_ASR_APP_CMD',
         'language': language,
         'context_tag': context_tag,
     })
 
-    connection_handshake(client)
+    connection_handshake(transaction)
+    return (client, transaction)
 
-    receivetask = asyncio.ensure_future(client.receive())
-    audiotask = asyncio.ensure_future(recorder.dequeue())
 
-    yield from listen_microphone(loop, client, recorder, audiotask, receivetask, logger)
+@asyncio.coroutine
+def _nlu_audio(loop, url, app_id, app_key, context_tag,  # pylint: disable=R0913,R0914
+               language, recorder, logger, pool=None, session=None, prewarm=False):
+    """Trying to understand audio
+
+    With `prewarm`, the connection is opened while the microphone is
+    already listened, early audio is buffered until the websocket is ready.
+    """
+    from pynuance.recorder import listen_microphone
+
+    begin = _begin_nlu_audio(url, app_id, app_key, context_tag, language, logger,
+                             pool, session)
+    if prewarm:
+        prewarmed = PrewarmedClient(begin, loop=loop)
+        try:
+            yield from listen_microphone(loop, prewarmed, recorder, logger, prewarmed)
+            client, transaction = yield from prewarmed.wait_ready()
+        except BaseException:
+            prewarmed.close()
+            raise
+    else:
+        client, transaction = yield from begin
+        try:
+            yield from listen_microphone(loop, client, recorder, logger, transaction)
+        except BaseException:
+            client.close()
+            raise
 
     recorder.stop()
 
     logger.debug("Send last message to Mix")
     client.send_message({
         'message': 'audio_end',
-        'audio_id': 456,
+        'audio_id': transaction.audio_id,
     })
 
     interpretation = {}
     while True:
-        yield from asyncio.wait((receivetask,), loop=loop)
         try:
-            _, msg = receivetask.result()
+            msg = yield from transaction.receive_message()
         except aiohttp.errors.ServerDisconnectedError:
             raise PyNuanceError("Error, check your context tag {} existence "
                                 "in MIX".format(context_tag))
@@ -107,41 +140,31 @@ def _nlu_audio(loop, url, app_id, app_key, context_tag,  # pylint: disable=R0914
         else:
             interpretation = msg
 
-        receivetask = asyncio.ensure_future(client.receive())
-
-    client.close()
+    release_client(pool, client)
     return interpretation
 
 
-def understand_text(app_id, app_key, context_tag, language, text, logger=None):
-    """Nlu text wrapper"""
+@asyncio.coroutine
+def async_understand_text(app_id, app_key, context_tag, language, text,  # pylint: disable=R0913
+                          logger=None, pool=None, session=None):
+    """Coroutine trying to understand a text"""
     if logger is None:
         logger = logging.getLogger("pynuance").getChild("nlu").getChild("text")
     # transform language
-    nlu_language = NLU_LANGUAGES.get(language)
-    if nlu_language is None:
-        raise PyNuanceError("Language should be in "
-                            "{}".format(", ".join(NLU_LANGUAGES.keys())))
-
-    logger.debug("Text received: {}".format(text))
-    try:
-        loop = asyncio.get_event_loop()
-    except RuntimeError:
-        logger.debug("Get New event loop")
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+    nlu_language = CATALOG.nlu_language(language)
 
+    logger.debug("Text received: %s", text)
     # TODO: try/except
-    interpretations = loop.run_until_complete(
-        _nlu_text("https://ws.dev.nuance.com",
-                  app_id,
-                  binascii.unhexlify(app_key),
-                  context_tag,
-                  text,
-                  nlu_language,
-                  logger,
-                  ))
-    # loop.close()
+    interpretations = yield from _nlu_text("https://ws.dev.nuance.com",
+                                           app_id,
+                                           binascii.unhexlify(app_key),
+                                           context_tag,
+                                           text,
+                                           nlu_language,
+                                           logger,
+                                           pool,
+                                           session,
+                                           )
     if interpretations is False:
         # The user did not speak
         return {}
@@ -149,28 +172,80 @@ def understand_text(app_id, app_key, context_tag, language, text, logger=None):
     return interpretations
 
 
+def understand_text(app_id, app_key, context_tag, language, text,  # pylint: disable=R0913
+                    logger=None, pool=None, loop=None):
+    """Nlu text wrapper"""
+    if loop is None:
+        loop = get_event_loop()
+    return loop.run_until_complete(async_understand_text(app_id, app_key, context_tag,
+                                                         language, text, logger=logger,
+                                                         pool=pool))
+
+
 @asyncio.coroutine
-def _nlu_text(url, app_id, app_key, context_tag, text_to_understand, language, logger):
+def async_understand_texts(app_id, app_key, context_tag, language, texts,  # pylint: disable=R0913
+                           logger=None, pool=None, session=None):
+    """Coroutine trying to understand several texts sent on the same connection"""
+    if logger is None:
+        logger = logging.getLogger("pynuance").getChild("nlu").getChild("text")
+    # transform language
+    nlu_language = CATALOG.nlu_language(language)
+
+    return (yield from _nlu_texts("https://ws.dev.nuance.com",
+                                  app_id,
+                                  binascii.unhexlify(app_key),
+                                  context_tag,
+                                  texts,
+                                  nlu_language,
+                                  logger,
+                                  pool,
+                                  session,
+                                  ))
+
+
+def understand_texts(app_id, app_key, context_tag, language, texts,  # pylint: disable=R0913
+                     logger=None, pool=None, loop=None):
+    """Nlu wrapper for several texts sent on the same connection"""
+    if loop is None:
+        loop = get_event_loop()
+    return loop.run_until_complete(async_understand_texts(app_id, app_key, context_tag,
+                                                          language, texts, logger=logger,
+                                                          pool=pool))
+
+
+@asyncio.coroutine
+def _nlu_text(url, app_id, app_key, context_tag, text_to_understand,  # pylint: disable=R0913
+              language, logger, pool=None, session=None):
     """Try to understand text"""
-    client = WebsocketConnection(url, logger)
+    audio_type = 'audio/L16;rate=16000'
     try:
-        yield from client.connect(app_id, app_key)
+        client = yield from acquire_client(pool, url, app_id, app_key, audio_type, logger,
+                                           device_id='55555500000000000000000000000000',
+                                           session=session)
     except aiohttp.errors.ClientOSError as exp:
         return exp
 
-    audio_type = 'audio/L16;rate=16000'
+    try:
+        ret = yield from _nlu_text_query(client, context_tag, text_to_understand, language)
+    except BaseException:
+        # The client is not reused and its pool slot is freed
+        client.close()
+        raise
+
+    release_client(pool, client)
+    return ret
 
-    client.send_message({'message': 'connect',
-                         'device_id': '55555500000000000000000000000000',
-                         'codec': audio_type
-                         })
 
-    _, msg = yield from client.receive()
-    logger.debug(msg)  # Should be a connected message
+@asyncio.coroutine
+def _nlu_text_query(client, context_tag, text_to_understand, language):
+    """Run one NLU text query on a connected client
 
+    Queries on the same client are multiplexed, each one gets its own transaction.
+    """
+    transaction = client.begin_transaction()
     client.send_message({
         'message': 'query_begin',
-        'transaction_id': 123,
+        'transaction_id': transaction.transaction_id,
 
         'command': 'NDSP_APP_CMD',
         'language': language,
@@ -179,7 +254,7 @@ def _nlu_text(url, app_id, app_key, context_tag, text_to_understand, language, l
 
     client.send_message({
         'message': 'query_parameter',
-        'transaction_id': 123,
+        'transaction_id': transaction.transaction_id,
 
         'parameter_name': 'REQUEST_INFO',
         'parameter_type': 'dictionary',
@@ -193,16 +268,36 @@ def _nlu_text(url, app_id, app_key, context_tag, text_to_understand, language, l
 
     client.send_message({
         'message': 'query_end',
-        'transaction_id': 123,
+        'transaction_id': transaction.transaction_id,
     })
 
     ret = ""
     while True:
-        _, msg = yield from client.receive()
+        msg = yield from transaction.receive_message()
 
         if msg['message'] == 'query_end':
             break
         ret = msg
 
-    client.close()
     return ret
+
+
+@asyncio.coroutine
+def _nlu_texts(url, app_id, app_key, context_tag, texts,  # pylint: disable=R0913
+               language, logger, pool=None, session=None):
+    """Try to understand several texts pipelined on one websocket"""
+    audio_type = 'audio/L16;rate=16000'
+    client = yield from acquire_client(pool, url, app_id, app_key, audio_type, logger,
+                                       device_id='55555500000000000000000000000000',
+                                       session=session)
+
+    try:
+        rets = yield from asyncio.gather(*[_nlu_text_query(client, context_tag, text, language)
+                                           for text in texts])
+    except BaseException:
+        # The client is not reused and its pool slot is freed
+        client.close()
+        raise
+
+    release_client(pool, client)
+    return rets
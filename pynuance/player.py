@@ -0,0 +1,160 @@
+"""Provides class to play audio on the sound card"""
+import asyncio
+import queue
+import threading
+import time
+
+import pyaudio
+
+
+# Default number of chunks the jitter buffer can hold
+BUFFER_SIZE = 64
+
+# Put in the jitter buffer after the last chunk
+_END = object()
+
+
+class Player:
+    """Play 16 bits PCM from a dedicated output thread
+
+    Chunks wait in a bounded jitter buffer, so the event loop keeps
+    receiving and decoding while the sound card plays. Playback starts as
+    soon as `prebuffer` chunks are buffered.
+
+    `metrics` holds `time_to_first_audio` (seconds between the opening of
+    the player and the first chunk played), `underruns` (times the buffer
+    was empty during playback) and `chunks` (chunks played).
+
+    If the output thread fails, its exception is raised by the next
+    :meth:`write` or :meth:`drain`.
+    """
+
+    def __init__(self, rate=16000, channels=1, buffer_size=BUFFER_SIZE,  # pylint: disable=R0913
+                 prebuffer=1, loop=None):
+        self.audio = pyaudio.PyAudio()
+        self.rate = rate
+        self.channels = channels
+        self.prebuffer = prebuffer
+        self.buffer = queue.Queue(maxsize=buffer_size)
+        self.metrics = {"time_to_first_audio": None,
+                        "underruns": 0,
+                        "chunks": 0,
+                        }
+        self.playstream = None
+        self._thread = None
+        self._opened_at = None
+        self._error = None
+        self._ended = False
+
+        # Event loop
+        if loop:
+            self.loop = loop
+        else:
+            self.loop = asyncio.get_event_loop()
+
+    def __enter__(self):
+        try:
+            self.playstream = self.audio.open(
+                self.rate,
+                self.channels,
+                pyaudio.paInt16,
+                output=True)
+        except BaseException:
+            # __exit__ is not called
+            self.audio.terminate()
+            raise
+        self._opened_at = time.monotonic()
+        self._thread = threading.Thread(target=self._play, name="pynuance-player", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, error_type, value, traceback):
+        self.close()
+
+    @asyncio.coroutine
+    def write(self, chunk):
+        """Queue a chunk, wait only if the jitter buffer is full"""
+        self._raise_error()
+        try:
+            self.buffer.put_nowait(chunk)
+        except queue.Full:
+            yield from self.loop.run_in_executor(None, self.buffer.put, chunk)
+        self._raise_error()
+
+    @asyncio.coroutine
+    def drain(self):
+        """Wait until all queued chunks are played"""
+        yield from self.write(_END)
+        yield from self.loop.run_in_executor(None, self._thread.join)
+        self._raise_error()
+
+    def _raise_error(self):
+        """Raise the exception of the output thread"""
+        if self._error is not None:
+            raise self._error
+
+    def _play(self):
+        """Output thread"""
+        try:
+            self._play_chunks()
+        except Exception as exp:  # pylint: disable=W0703
+            self._error = exp
+            # Keep consuming so writers never block on a full buffer
+            while not self._ended:
+                self._ended = self.buffer.get() is _END
+
+    def _play_chunks(self):
+        """Play the chunks of the jitter buffer until `_END`"""
+        # Wait for the first chunks
+        chunks = []
+        chunk = None
+        while len(chunks) < self.prebuffer:
+            chunk = self.buffer.get()
+            if chunk is _END:
+                self._ended = True
+                break
+            chunks.append(chunk)
+        for buffered in chunks:
+            self._write_chunk(buffered)
+        if chunk is _END:
+            return
+
+        while True:
+            try:
+                chunk = self.buffer.get_nowait()
+            except queue.Empty:
+                # The sound card waits for the network
+                self.metrics["underruns"] += 1
+                chunk = self.buffer.get()
+            if chunk is _END:
+                self._ended = True
+                return
+            self._write_chunk(chunk)
+
+    def _write_chunk(self, chunk):
+        """Play a chunk, blocking until the sound card takes it"""
+        if self.metrics["time_to_first_audio"] is None:
+            self.metrics["time_to_first_audio"] = time.monotonic() - self._opened_at
+        self.playstream.write(chunk)
+        self.metrics["chunks"] += 1
+
+    def close(self):
+        """Stop playing, drop the chunks not played yet and close the sound card"""
+        if self._thread is not None:
+            while True:
+                try:
+                    self.buffer.put_nowait(_END)
+                    break
+                except queue.Full:
+                    # Make room, these chunks will not be played
+                    try:
+                        self.buffer.get_nowait()
+                    except queue.Empty:
+                        pass
+            self._thread.join()
+            self._thread = None
+        if self.playstream is not None:
+            self.playstream.stop_stream()
+            self.playstream.close()
+            self.playstream = None
+        self.audio.terminate()
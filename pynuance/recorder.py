@@ -1,143 +1,77 @@
 """Provides class to listen to a microphone"""
 import asyncio
 import itertools
+import threading
 
-import audioop
 import pyaudio
-try:
-    import speex
-except ImportError:
-    speex = None
 
-# SILENT DETECTION
-# TODO adjust it
-FS_NB_CHUNK = 100
-NB_CHUNK = 5
-THRESHOLD = 500
+from pynuance.libs.audio import AudioQueue, BLOCK, DROP_OLDEST, EncoderStage, SpeexEncoder
+from pynuance.libs.vad import EnergyVad
 
+# Frames read at once from the sound card
+FRAMES_PER_BUFFER = 1024
 
-@asyncio.coroutine
-def listen_microphone(loop, client, recorder, audiotask, receivetask=None, logger=None):
-    """Listen microphone and send audio to Nuance"""
-    # Prepare silent vars
-    audio = b''
-    rawaudio = b''
-
-    encoder = speex.WBEncoder()  # pylint: disable=E1101
-
-    # Prepare audio
-    rate = recorder.rate
-    resampler = None
-
-    if rate >= 16000:
-        if rate != 16000:
-            resampler = speex.SpeexResampler(1, rate, 16000)  # pylint: disable=E1101
-    else:
-        if rate != 8000:
-            resampler = speex.SpeexResampler(1, rate, 8000)  # pylint: disable=E1101
-
-    silent_list = []
-    first_silent_done = False
-    while True:
-        while len(rawaudio) > 320*recorder.channels*2:
-            count = len(rawaudio)
-            if count > 320*4*recorder.channels*2:
-                count = 320*4*recorder.channels*2
-
-            procsamples = b''
-            if recorder.channels > 1:
-                for i in range(0, count, 2*recorder.channels):
-                    procsamples += rawaudio[i:i+1]
-            else:
-                procsamples = rawaudio[:count]
-
-            rawaudio = rawaudio[count:]
-
-            if resampler:
-                audio += resampler.process(procsamples)
-            else:
-                audio += procsamples
-
-        while len(audio) > encoder.frame_size*2:
-            coded = encoder.encode(audio[:encoder.frame_size*2])
-            client.send_audio(coded)
-            audio = audio[encoder.frame_size*2:]
-
-        if receivetask is not None:
-            yield from asyncio.wait((audiotask, receivetask),
-                                    return_when=asyncio.FIRST_COMPLETED,
-                                    loop=loop)
-        else:
-            yield from asyncio.wait((audiotask,),
-                                    return_when=asyncio.FIRST_COMPLETED,
-                                    loop=loop)
-
-        # SILENT DETECTION
-        ret, silent_list, first_silent_done = silent_detection(audio, silent_list,
-                                                               first_silent_done, logger)
-        if ret is False:
-            # TODO document this
-            return ret
-        if ret is True:
-            # TODO document this
-            break
-
-        if audiotask.done():
-            more_audio = audiotask.result()
-            rawaudio += more_audio
-            audiotask = asyncio.ensure_future(recorder.dequeue())
-
-        if receivetask is not None and receivetask.done():
-            _, msg = receivetask.result()
-            logger.debug(msg)
-
-            if msg['message'] == 'query_end':
-                client.close()
-                return
 
-            receivetask = asyncio.ensure_future(client.receive())
+@asyncio.coroutine
+def listen_microphone(loop, client, recorder, logger=None,  # pylint: disable=R0913
+                      transaction=None, vad=None, executor=None):
+    """Listen microphone and send audio to Nuance until the end of speech
 
+    `vad` detects the end of speech, see :mod:`pynuance.libs.vad`, it is an
+    :class:`~pynuance.libs.vad.EnergyVad` by default. Return False if the
+    user did not speak.
 
-def silent_detection(audio, silent_list, first_silent_done, logger):
-    """Analyse audio chunk to determine if this is a silent
+    The audio is encoded in `executor`, see :class:`~pynuance.libs.audio.EncoderStage`.
 
-    return False: the user did NOT speak
-    return None: the user is speaking or we are waiting for it
-    return True: the user had finished to speack
+    Server messages stay queued on `transaction`, it is only checked to stop
+    listening if the server already ended the query. With a
+    :class:`~pynuance.websocket.PrewarmedClient`, give it as the transaction too.
     """
-    # Get rms for this chunk
-    audio_rms = audioop.rms(audio, 2)
-    # Detect first silent
-    if first_silent_done is False:
-        logger.debug("Audio level: %s", audio_rms)
-        if audio_rms < THRESHOLD:
-            logger.debug("Waiting for user speaking")
-            silent_list.append(True)
-        else:
-            logger.debug("User is maybe starting to speak")
-            silent_list.append(False)
-        if len([s for s in silent_list if s is False]) > 5:
-            logger.debug("User is starting to speak")
-            silent_list = []
-            first_silent_done = True
-        if len(silent_list) > FS_NB_CHUNK:
-            logger.debug("The user did NOT speak")
-            return False, silent_list, first_silent_done
-    else:
-        silent_list.append(True if audio_rms < THRESHOLD else False)
-        if len(silent_list) > NB_CHUNK:
-            logger.debug("The user is speaking. Level: %d", audio_rms)
-            silent_list.pop(0)
-        if len(silent_list) == NB_CHUNK and all(silent_list):
-            logger.debug("The user has finished to speak")
-            return True, silent_list, first_silent_done
-    return None, silent_list, first_silent_done
+    stage = EncoderStage(SpeexEncoder(recorder.rate, recorder.channels), executor, loop)
+    if vad is None:
+        vad = EnergyVad()
+
+    task = asyncio.ensure_future(stage.run(recorder), loop=loop)
+    try:
+        while True:
+            item = yield from stage.get()
+            if item is None:
+                # The recorder failed
+                yield from task
+                return
+            frame, coded = item
+            yield from client.write_audio(coded)
+            speech_ended = vad.process(frame)
+            if speech_ended is False:
+                if logger is not None:
+                    logger.debug("The user did NOT speak")
+                return False
+            if speech_ended is True:
+                if logger is not None:
+                    logger.debug("The user has finished to speak")
+                return
+
+            if transaction is not None and transaction.finished:
+                # The server ended the query before the end of speech
+                client.close()
+                return
+    finally:
+        task.cancel()
+        if logger is not None:
+            logger.debug("Encoding timings: %s %s", stage.timings, stage.encoder.timings)
 
 
 class Recorder:
-    """Record voice from microphone"""
+    """Record voice from microphone
 
-    def __init__(self, device_index=None, rate=None, channels=None, loop=None):
+    Captured buffers wait in an :class:`~pynuance.libs.audio.AudioQueue` of
+    `queue_size` buffers, `overflow` chooses what happens when it is full.
+    Buffers come from a PortAudio callback, or with BLOCK from a reading
+    thread, so waiting for room never blocks PortAudio.
+    """
+
+    def __init__(self, device_index=None, rate=None, channels=None,  # pylint: disable=R0913
+                 loop=None, queue_size=64, overflow=DROP_OLDEST):
 
         # Audio configuration
         self.audio = pyaudio.PyAudio()
@@ -154,44 +88,92 @@ class Recorder:
             self.channels = channels
 
         self.recstream = None
+        self._reader = None
+        self._stopped = threading.Event()
 
         # Event loop
         if loop:
             self.loop = loop
         else:
             self.loop = asyncio.get_event_loop()
-        self.queue_event = asyncio.Event(loop=self.loop)
-        self.audio_queue = []
+        self.audio_queue = AudioQueue(queue_size, overflow, self.loop)
 
     def __enter__(self):
-        self.recstream = self.audio.open(
-            self.rate,
-            self.channels,
-            pyaudio.paInt16,
-            input=True,
-            input_device_index=self.device_index,
-            stream_callback=self.callback)
+        if self.audio_queue.overflow == BLOCK:
+            self.recstream = self.audio.open(
+                self.rate,
+                self.channels,
+                pyaudio.paInt16,
+                input=True,
+                input_device_index=self.device_index,
+                frames_per_buffer=FRAMES_PER_BUFFER)
+            self._stopped.clear()
+            self._reader = threading.Thread(target=self._read, name="pynuance-recorder",
+                                            daemon=True)
+            self._reader.start()
+        else:
+            self.recstream = self.audio.open(
+                self.rate,
+                self.channels,
+                pyaudio.paInt16,
+                input=True,
+                input_device_index=self.device_index,
+                frames_per_buffer=FRAMES_PER_BUFFER,
+                stream_callback=self.callback)
         return self
 
     def __exit__(self, error_type, value, traceback):
+        self._stop_reader()
         if self.recstream is not None:
             self.recstream.close()
+            self.recstream = None
+
+    def _read(self):
+        """Reading thread of BLOCK recorders"""
+        while not self._stopped.is_set():
+            try:
+                audio = self.recstream.read(FRAMES_PER_BUFFER)
+            except IOError:
+                # Input overflow, the sound card already dropped these samples
+                self.loop.call_soon_threadsafe(self.audio_queue.drop)
+                continue
+            if not self.audio_queue.put_threadsafe(audio, self._stopped):
+                return
+
+    def _stop_reader(self):
+        """Stop the reading thread, even if it waits for room in the queue"""
+        if self._reader is not None:
+            self._stopped.set()
+            self._reader.join()
+            self._reader = None
 
     def enqueue(self, audio):  # pylint: disable=C0111
-        self.audio_queue.append(audio)
-        self.queue_event.set()
+        self.audio_queue.put_nowait(audio)
 
     @asyncio.coroutine
     def dequeue(self):  # pylint: disable=C0111
-        while True:
-            self.queue_event.clear()
-            if self.audio_queue:
-                return self.audio_queue.pop(0)
-            yield from self.queue_event.wait()
+        return (yield from self.audio_queue.get())
+
+    def __aiter__(self):
+        return self
+
+    @asyncio.coroutine
+    def __anext__(self):
+        return (yield from self.dequeue())
+
+    @property
+    def dropped(self):
+        """Buffers dropped because the queue was full"""
+        return self.audio_queue.dropped
+
+    @property
+    def queue_depth(self):
+        """Buffers waiting to be sent"""
+        return self.audio_queue.depth
 
     def callback(self, in_data, frame_count, time_info, status_flags):  # pylint: disable=W0613
         """Callback function"""
-        self.loop.call_soon_threadsafe(self.enqueue, in_data)
+        self.audio_queue.put_threadsafe(in_data)
         return (None, pyaudio.paContinue)
 
     def pick_default_device_index(self):  # pylint: disable=C0111
@@ -235,4 +217,5 @@ class Recorder:
 
     def stop(self):
         """Kill recorder"""
+        self._stop_reader()
         self.audio.terminate()
@@ -2,32 +2,35 @@
 import asyncio
 import binascii
 import logging
+import wave
 
-from pynuance.websocket import WebsocketConnection, connection_handshake
-from pynuance.recorder import Recorder, listen_microphone
+from pynuance.websocket import (acquire_client, release_client, connection_handshake,
+                                PrewarmedClient)
+from pynuance.libs.audio import send_pcm_stream
+from pynuance.libs.common import get_event_loop
+from pynuance.libs.error import PyNuanceError
+
+# Nuance websocket service
+URL = "https://ws.dev.nuance.com/v1/"
+
+# Bytes read at once from audio files
+FILE_CHUNK_SIZE = 64 * 1024
 
 
 @asyncio.coroutine
-def do_recognize(loop, url, app_id, app_key, language,  # pylint: disable=R0914,R0914
-                 recorder, logger):
-    """Main function for Speech-To-Text"""
-    # Websocket client
-    client = WebsocketConnection(url, logger)
-    yield from client.connect(app_id, app_key)
-
-    # Init Nuance communication
+def _begin_recognition(url, app_id, app_key, language,  # pylint: disable=R0913
+                       logger, pool=None, session=None):
+    """Connect and start a recognition query, return its (client, transaction)"""
+    # Websocket client and Nuance communication
     audio_type = 'audio/x-speex;mode=wb'
-    client.send_message({
-        'message': 'connect',
-        'device_id': '55555500000000000000000000000000',
-        'codec': audio_type,
-    })
-
-    _, msg = yield from client.receive()
+    client = yield from acquire_client(pool, url, app_id, app_key, audio_type, logger,
+                                       device_id='55555500000000000000000000000000',
+                                       session=session)
 
+    transaction = client.begin_transaction()
     client.send_message({
         'message': 'query_begin',
-        'transaction_id': 123,
+        'transaction_id': transaction.transaction_id,
 
         'command': 'NVC_ASR_CMD',
         'language': language,
@@ -36,57 +39,208 @@ def do_recognize(loop, url, app_id, app_key, language,  # pylint: disable=R0914,
         'recognition_type': 'DICTATION',
     })
 
-    connection_handshake(client)
+    connection_handshake(transaction)
+    return (client, transaction)
 
-    audiotask = asyncio.ensure_future(recorder.dequeue())
 
-    yield from listen_microphone(loop, client, recorder, audiotask, None, logger)
+@asyncio.coroutine
+def do_recognize(loop, url, app_id, app_key, language,  # pylint: disable=R0913,R0914
+                 recorder, logger, pool=None, session=None, prewarm=False):
+    """Main function for Speech-To-Text
+
+    With `prewarm`, the connection is opened while the microphone is
+    already listened, early audio is buffered until the websocket is ready.
+    """
+    # PyAudio is only needed for the microphone
+    from pynuance.recorder import listen_microphone
+
+    begin = _begin_recognition(url, app_id, app_key, language, logger, pool, session)
+    if prewarm:
+        prewarmed = PrewarmedClient(begin, loop=loop)
+        try:
+            yield from listen_microphone(loop, prewarmed, recorder, logger, prewarmed)
+            client, transaction = yield from prewarmed.wait_ready()
+        except BaseException:
+            prewarmed.close()
+            raise
+    else:
+        client, transaction = yield from begin
+        try:
+            yield from listen_microphone(loop, client, recorder, logger, transaction)
+        except BaseException:
+            client.close()
+            raise
 
     recorder.stop()
 
-    client.send_message({
-        'message': 'audio_end',
-        'audio_id': 456,
-    })
+    return (yield from _end_recognition(client, transaction, logger, pool))
+
 
+@asyncio.coroutine
+def _end_recognition(client, transaction, logger, pool=None):
+    """Send `audio_end` and return the messages of the query"""
     msg_list = []
-    while True:
-        _, msg = yield from client.receive()
-        logger.debug(msg)
+    try:
+        client.send_message({
+            'message': 'audio_end',
+            'audio_id': transaction.audio_id,
+        })
+
+        while True:
+            msg = yield from transaction.receive_message()
+            logger.debug(msg)
+
+            if msg['message'] == 'query_end':
+                break
+            else:
+                msg_list.append(msg)
+    except BaseException:
+        # The client is not reused and its pool slot is freed
+        client.close()
+        raise
+
+    release_client(pool, client)
 
-        if msg['message'] == 'query_end':
-            break
-        else:
-            msg_list.append(msg)
+    return msg_list
 
-    client.close()
 
-    return msg_list
+@asyncio.coroutine
+def async_speech_to_text(app_id, app_key, language, logger=None,  # pylint: disable=R0913
+                         pool=None, session=None, recorder=None, loop=None, prewarm=False):
+    """Coroutine doing speech to text from mic and returning result.
 
+    A :class:`pynuance.recorder.Recorder` is opened if `recorder` is None.
+    See :func:`do_recognize` for `prewarm`.
+    """
+    if logger is None:
+        logger = logging.getLogger("pynuance").getChild("stt")
+    if loop is None:
+        loop = asyncio.get_event_loop()
 
-def speech_to_text(app_id, app_key, language, logger=None):
+    if recorder is None:
+        from pynuance.recorder import Recorder
+        with Recorder(loop=loop) as recorder:
+            return (yield from async_speech_to_text(app_id, app_key, language, logger,
+                                                    pool, session, recorder, loop, prewarm))
+
+    return (yield from do_recognize(
+        loop,
+        URL,
+        app_id,
+        binascii.unhexlify(app_key),
+        language,
+        recorder=recorder,
+        logger=logger,
+        pool=pool,
+        session=session,
+        prewarm=prewarm,
+        ))
+
+
+def speech_to_text(app_id, app_key, language, logger=None,  # pylint: disable=R0913
+                   pool=None, loop=None, prewarm=False):
     """Speech to text from mic and return result.
 
     This function auto detect a silence
     """
+    if loop is None:
+        loop = get_event_loop()
+    return loop.run_until_complete(async_speech_to_text(app_id, app_key, language,
+                                                        logger=logger, pool=pool, loop=loop,
+                                                        prewarm=prewarm))
+
+
+@asyncio.coroutine
+def do_recognize_stream(url, app_id, app_key, language,  # pylint: disable=R0913
+                        chunks, rate, channels, logger, pool=None, session=None):
+    """Speech-To-Text of an async iterator of PCM chunks
+
+    Audio is sent as fast as the websocket accepts it, not in real time.
+    """
+    client, transaction = yield from _begin_recognition(url, app_id, app_key, language, logger,
+                                                        pool, session)
+    try:
+        yield from send_pcm_stream(client, chunks, rate, channels)
+    except Exception:
+        client.close()
+        raise
+    return (yield from _end_recognition(client, transaction, logger, pool))
+
+
+@asyncio.coroutine
+def async_recognize_stream(app_id, app_key, language, chunks,  # pylint: disable=R0913
+                           rate=16000, channels=1, logger=None, pool=None, session=None):
+    """Coroutine doing speech to text of an async iterator of 16 bits PCM chunks"""
     if logger is None:
         logger = logging.getLogger("pynuance").getChild("stt")
-    try:
-        loop = asyncio.get_event_loop()
-    except RuntimeError:
-        # logger.debug("Get New event loop")
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-
-    with Recorder(loop=loop) as recorder:
-        output = loop.run_until_complete(do_recognize(
-            loop,
-            "https://ws.dev.nuance.com/v1/",
-            app_id,
-            binascii.unhexlify(app_key),
-            language,
-            recorder=recorder,
-            logger=logger,
-            ))
-        loop.stop()
-    return output
+    return (yield from do_recognize_stream(URL,
+                                           app_id,
+                                           binascii.unhexlify(app_key),
+                                           language,
+                                           chunks,
+                                           rate,
+                                           channels,
+                                           logger,
+                                           pool,
+                                           session,
+                                           ))
+
+
+def recognize_stream(app_id, app_key, language, chunks,  # pylint: disable=R0913
+                     rate=16000, channels=1, logger=None, pool=None, loop=None):
+    """Speech to text of an async iterator of 16 bits PCM chunks"""
+    if loop is None:
+        loop = get_event_loop()
+    return loop.run_until_complete(async_recognize_stream(app_id, app_key, language, chunks,
+                                                          rate, channels, logger=logger,
+                                                          pool=pool))
+
+
+class _FileChunks(object):
+    """Async iterator over the chunks of a file-like object"""
+
+    def __init__(self, read):
+        self._read = read
+
+    def __aiter__(self):
+        return self
+
+    @asyncio.coroutine
+    def __anext__(self):
+        chunk = self._read()
+        if not chunk:
+            raise StopAsyncIteration
+        return chunk
+
+
+@asyncio.coroutine
+def async_recognize_file(app_id, app_key, language, file_path,  # pylint: disable=R0913
+                         rate=16000, channels=1, logger=None, pool=None, session=None):
+    """Coroutine doing speech to text of a WAV or raw 16 bits PCM file
+
+    `rate` and `channels` are only used for raw PCM, WAV files give theirs.
+    """
+    if file_path.lower().endswith(".wav"):
+        with wave.open(file_path, "rb") as wav_file:
+            if wav_file.getsampwidth() != 2:
+                raise PyNuanceError("Only 16 bits WAV files are supported")
+            frames = FILE_CHUNK_SIZE // (2 * wav_file.getnchannels())
+            chunks = _FileChunks(lambda: wav_file.readframes(frames))
+            return (yield from async_recognize_stream(app_id, app_key, language, chunks,
+                                                      wav_file.getframerate(),
+                                                      wav_file.getnchannels(),
+                                                      logger, pool, session))
+    with open(file_path, "rb") as raw_file:
+        chunks = _FileChunks(lambda: raw_file.read(FILE_CHUNK_SIZE))
+        return (yield from async_recognize_stream(app_id, app_key, language, chunks, rate,
+                                                  channels, logger, pool, session))
+
+
+def recognize_file(app_id, app_key, language, file_path,  # pylint: disable=R0913
+                   rate=16000, channels=1, logger=None, pool=None, loop=None):
+    """Speech to text of a WAV or raw 16 bits PCM file"""
+    if loop is None:
+        loop = get_event_loop()
+    return loop.run_until_complete(async_recognize_file(app_id, app_key, language, file_path,
+                                                        rate, channels, logger=logger,
+                                                        pool=pool))
@@ -0,0 +1,321 @@
+"""Provides a local stand-in for the Nuance websocket service
+
+It speaks the same protocol as ws.dev.nuance.com (`connect`/`connected`,
+`query_begin`/`query_parameter`/`query_end`, `audio` and `audio_end`) so
+the client can be tested and benchmarked offline.
+"""
+import argparse
+import asyncio
+import binascii
+import datetime
+import email.utils
+import hashlib
+import hmac
+import json
+import random
+import sys
+import uuid
+
+from aiohttp import web
+
+
+TTS_COMMANDS = ('NVC_TTS_CMD', 'NDMP_TTS_CMD')
+AUDIO_COMMANDS = ('NVC_ASR_CMD', 'NDSP_ASR_APP_CMD', 'DRAGON_NLU_ASR_CMD')
+
+
+class _StubTransaction(object):  # pylint: disable=R0903
+    """State of one query received by the stub server"""
+
+    def __init__(self, transaction_id, command, language):
+        self.transaction_id = transaction_id
+        self.command = command
+        self.language = language
+        self.parameters = {}
+        self.audio_id = None
+        self.audio_bytes = 0
+        self.ended = False
+
+
+class NuanceStubServer(object):  # pylint: disable=R0902
+    """Local server speaking the Nuance websocket protocol
+
+    :param str app_id: Expected application ID
+    :param bytes app_key: Expected (binary) application key
+    :param float latency: Seconds before each response
+    :param float jitter: Maximum random seconds added to or removed from `latency`
+    :param int audio_chunk_size: Bytes of each synthesized audio frame
+    :param int audio_chunks: Number of audio frames by synthesis
+    :param list audio_frames: Encoded frames sent by every synthesis instead of
+        :meth:`tts_frames`
+    :param float error_rate: Probability of answering a query with `query_error`
+    :param float disconnect_rate: Probability of dropping the socket on a query
+    :param float clock_skew: Seconds the server clock is ahead of the real one
+    :param int seed: Seed of the random generator used for jitter and errors
+    :param bool record: Keep received messages (dicts) and audio (bytes) in `messages`
+    """
+
+    def __init__(self, app_id="stub_app_id", app_key=b"stub_app_key",  # pylint: disable=R0913
+                 latency=0, jitter=0, audio_chunk_size=640, audio_chunks=10,
+                 error_rate=0, disconnect_rate=0, clock_skew=0, seed=None,
+                 host="127.0.0.1", port=0, loop=None, audio_frames=None, record=False):
+        self.app_id = app_id
+        self.app_key = app_key
+        self.latency = latency
+        self.jitter = jitter
+        self.audio_chunk_size = audio_chunk_size
+        self.audio_chunks = audio_chunks
+        self.audio_frames = audio_frames
+        self.error_rate = error_rate
+        self.disconnect_rate = disconnect_rate
+        self.clock_skew = clock_skew
+        self.record = record
+        self.messages = []
+        self.host = host
+        self.port = port
+        self.loop = loop if loop is not None else asyncio.get_event_loop()
+        self.random = random.Random(seed)
+        self.stats = {"connections": 0,
+                      "rejected": 0,
+                      "queries": 0,
+                      "errors": 0,
+                      "audio_bytes_received": 0,
+                      "audio_bytes_sent": 0,
+                      }
+        self._app = None
+        self._handler = None
+        self._server = None
+        self._transports = set()
+
+    @property
+    def url(self):
+        """URL to give to the client instead of https://ws.dev.nuance.com/v1/"""
+        return "http://{}:{}/v1/".format(self.host, self.port)
+
+    @asyncio.coroutine
+    def start(self):
+        """Start listening"""
+        self._app = web.Application(loop=self.loop)
+        self._app.router.add_route('GET', '/', self._websocket_handler)
+        self._app.router.add_route('GET', '/v1/', self._websocket_handler)
+        self._handler = self._app.make_handler()
+        self._server = yield from self.loop.create_server(self._handler, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    @asyncio.coroutine
+    def stop(self):
+        """Close all connections and stop listening"""
+        yield from self._handler.finish_connections(1.0)
+        self._server.close()
+        yield from self._server.wait_closed()
+        yield from self._app.finish()
+
+    def pause_reading(self):
+        """Stop reading the open connections, like a congested uplink"""
+        for transport in self._transports:
+            transport.pause_reading()
+
+    def resume_reading(self):
+        """Read the open connections again"""
+        for transport in self._transports:
+            transport.resume_reading()
+
+    def tts_frames(self, text):
+        """PCM frames synthesized for a text: its UTF-8 bytes repeated"""
+        if self.audio_frames is not None:
+            return self.audio_frames
+        pattern = text.encode('utf-8') or b"\0"
+        frame = (pattern * (self.audio_chunk_size // len(pattern) + 1))[:self.audio_chunk_size]
+        return [frame] * self.audio_chunks
+
+    def server_date(self):
+        """Current date of the server clock"""
+        return datetime.datetime.utcnow() + datetime.timedelta(seconds=self.clock_skew)
+
+    @asyncio.coroutine
+    def _delay(self):
+        """Simulate network and processing latency"""
+        delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            yield from asyncio.sleep(delay, loop=self.loop)
+
+    def _check_auth(self, params):
+        """Check credentials of a connection request"""
+        if params.get('app_id') != self.app_id:
+            return False
+        if params.get('algorithm') == 'key':
+            return params.get('app_key') == binascii.hexlify(self.app_key).decode()
+        if params.get('algorithm') == 'HMAC-SHA-256':
+            try:
+                date = datetime.datetime.strptime(params.get('date', ''), "%Y-%m-%dT%H:%M:%S")
+            except ValueError:
+                return False
+            if abs((self.server_date() - date).total_seconds()) > 5:
+                return False
+            value = params['date'].encode('ascii') + b' ' + self.app_id.encode('utf-8')
+            signature = hmac.new(self.app_key, value, hashlib.sha256).hexdigest()
+            return hmac.compare_digest(signature, params.get('signature', ''))
+        return False
+
+    @asyncio.coroutine
+    def _websocket_handler(self, request):
+        """Authenticate the client then run the protocol"""
+        if not self._check_auth(request.GET):
+            self.stats["rejected"] += 1
+            date = self.server_date().replace(tzinfo=datetime.timezone.utc)
+            date = email.utils.format_datetime(date, usegmt=True)
+            return web.Response(status=401, headers={'Date': date},
+                                body=b"Authorization failure")
+
+        self.stats["connections"] += 1
+        wsr = web.WebSocketResponse()
+        wsr.start(request)
+        self._transports.add(request.transport)
+        try:
+            yield from self._run_protocol(wsr, request.transport)
+        finally:
+            self._transports.discard(request.transport)
+        return wsr
+
+    @asyncio.coroutine
+    def _run_protocol(self, wsr, transport):
+        """Handle messages of one connection"""
+        transactions = {}
+        audio_transactions = {}
+        current_audio = None
+        while True:
+            msg = yield from wsr.receive()
+            if msg.tp == web.MsgType.binary:
+                if self.record:
+                    self.messages.append(msg.data)
+                self.stats["audio_bytes_received"] += len(msg.data)
+                if current_audio is not None:
+                    current_audio.audio_bytes += len(msg.data)
+                continue
+            if msg.tp != web.MsgType.text:
+                break
+
+            data = json.loads(msg.data)
+            if self.record:
+                self.messages.append(data)
+            message = data.get('message')
+            if message == 'connect':
+                yield from self._delay()
+                wsr.send_str(json.dumps({'message': 'connected',
+                                         'session_id': uuid.uuid4().hex}))
+            elif message == 'query_begin':
+                transaction = _StubTransaction(data['transaction_id'], data.get('command'),
+                                               data.get('language'))
+                transactions[transaction.transaction_id] = transaction
+            elif message == 'query_parameter':
+                transaction = transactions[data['transaction_id']]
+                transaction.parameters[data['parameter_name']] = data
+                if data['parameter_name'] == 'AUDIO_INFO':
+                    transaction.audio_id = data['audio_id']
+                    audio_transactions[transaction.audio_id] = transaction
+                elif data['parameter_name'] == 'TEXT_TO_READ':
+                    transaction.audio_id = data['dictionary']['audio_id']
+            elif message == 'query_end':
+                transaction = transactions[data['transaction_id']]
+                transaction.ended = True
+                if transaction.command not in AUDIO_COMMANDS:
+                    asyncio.ensure_future(self._respond(wsr, transport, transaction),
+                                          loop=self.loop)
+            elif message == 'audio':
+                current_audio = audio_transactions.get(data['audio_id'])
+            elif message == 'audio_end':
+                transaction = audio_transactions.pop(data['audio_id'], None)
+                if current_audio is transaction:
+                    current_audio = None
+                if transaction is not None:
+                    asyncio.ensure_future(self._respond(wsr, transport, transaction),
+                                          loop=self.loop)
+
+    @asyncio.coroutine
+    def _respond(self, wsr, transport, transaction):
+        """Send the result of a query"""
+        self.stats["queries"] += 1
+        yield from self._delay()
+        if wsr.closed or transport.is_closing():
+            return
+        if self.random.random() < self.disconnect_rate:
+            # Drop the socket without websocket close frame
+            transport.close()
+            return
+        if self.random.random() < self.error_rate:
+            self.stats["errors"] += 1
+            wsr.send_str(json.dumps({'message': 'query_error',
+                                     'transaction_id': transaction.transaction_id,
+                                     'reason': 'Injected error'}))
+        elif transaction.command in TTS_COMMANDS:
+            wsr.send_str(json.dumps({'message': 'audio_begin',
+                                     'audio_id': transaction.audio_id}))
+            text = (transaction.parameters.get('TEXT_TO_READ', {})
+                    .get('dictionary', {})
+                    .get('tts_input', ''))
+            for frame in self.tts_frames(text):
+                wsr.send_bytes(frame)
+                self.stats["audio_bytes_sent"] += len(frame)
+            wsr.send_str(json.dumps({'message': 'audio_end',
+                                     'audio_id': transaction.audio_id}))
+        elif transaction.command in AUDIO_COMMANDS:
+            wsr.send_str(json.dumps({
+                'message': 'query_response',
+                'transaction_id': transaction.transaction_id,
+                'transcriptions': ['stub transcription'],
+                'confidences': [1.0],
+                'audio_bytes': transaction.audio_bytes,
+            }))
+        else:
+            text = (transaction.parameters.get('REQUEST_INFO', {})
+                    .get('dictionary', {})
+                    .get('application_data', {})
+                    .get('text_input'))
+            wsr.send_str(json.dumps({
+                'message': 'query_response',
+                'transaction_id': transaction.transaction_id,
+                'nlu_interpretation_results': {
+                    'status': 'success',
+                    'payload': {'interpretations': [{'literal': text}]},
+                },
+            }))
+        wsr.send_str(json.dumps({'message': 'query_end',
+                                 'transaction_id': transaction.transaction_id}))
+
+
+def main():
+    """Run the stub server until interrupted"""
+    parser = argparse.ArgumentParser(description="Local Nuance websocket stub server")
+    parser.add_argument('-H', '--host', default="127.0.0.1", help='Listening address')
+    parser.add_argument('-P', '--port', default=8080, type=int, help='Listening port')
+    parser.add_argument('-i', '--app-id', default="stub_app_id", help='App Id')
+    parser.add_argument('-k', '--app-key', default="stub_app_key", help='App Key')
+    parser.add_argument('-L', '--latency', default=0, type=float, help='Latency (s)')
+    parser.add_argument('-J', '--jitter', default=0, type=float, help='Jitter (s)')
+    parser.add_argument('-s', '--audio-chunk-size', default=640, type=int,
+                        help='Bytes by audio frame')
+    parser.add_argument('-n', '--audio-chunks', default=10, type=int,
+                        help='Audio frames by synthesis')
+    parser.add_argument('-e', '--error-rate', default=0, type=float,
+                        help='Probability of query errors')
+    parser.add_argument('-d', '--disconnect-rate', default=0, type=float,
+                        help='Probability of disconnections')
+    parser.add_argument('-S', '--clock-skew', default=0, type=float,
+                        help='Server clock skew (s)')
+    args = parser.parse_args()
+
+    loop = asyncio.get_event_loop()
+    server = NuanceStubServer(args.app_id, args.app_key.encode(), args.latency, args.jitter,
+                              args.audio_chunk_size, args.audio_chunks, args.error_rate,
+                              args.disconnect_rate, args.clock_skew,
+                              host=args.host, port=args.port, loop=loop)
+    loop.run_until_complete(server.start())
+    print("Nuance stub server listening on {}".format(server.url))
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    loop.run_until_complete(server.stop())
+
+
+if __name__ == '__main__':
+    sys.exit(main())
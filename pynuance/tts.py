@@ -1,9 +1,14 @@
 """Provides Text-To-Speech functions"""
 import asyncio
+import audioop
 import binascii
+import ctypes
 import logging
+import os
+import re
+import time
+import wave
 
-import pyaudio
 try:
     import speex
 except ImportError:
@@ -14,10 +19,14 @@ try:
 except ImportError:
     opus = None
 
-from pynuance.websocket import WebsocketConnection
-from pynuance.libs.languages import LANGUAGES
+from pynuance.websocket import WebsocketPool, acquire_client, release_client
+from pynuance.libs.languages import CATALOG
+from pynuance.libs.common import get_event_loop
 from pynuance.libs.error import PyNuanceError
 
+# Nuance websocket service
+URL = "https://ws.dev.nuance.com/v1/"
+
 AUDIO_TYPES = [
     'audio/x-speex;mode=wb',
     'audio/opus;rate=16000',
@@ -41,6 +50,17 @@ COMMANDS = [
     'NDSP_DELETE_ALL_DATA_CMD',
 ]
 
+# PCM produced by all codecs
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+CHANNELS = 1
+
+# Whitespaces after the end of a sentence
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+# Maximum samples by channel of an Opus frame (120 ms at 16 kHz)
+OPUS_MAX_FRAME_SIZE = 1920
+
 VOICES = {"eng-USA": {"female": "ava",
                       "male": "tom"},
           "fra-FRA": {"female": "aurelie",
@@ -48,52 +68,83 @@ VOICES = {"eng-USA": {"female": "ava",
           }
 
 
-def _get_opus_decoder_func(decoder):
-    """Create function for Opus codec"""
-    def decoder_func(msg):
-        """Opus decoder function"""
-        opus.decoder.decode(decoder, msg, len(msg), 1920, False, 1)
+class _OpusDecoder(object):  # pylint: disable=R0903
+    """Opus decoder writing PCM in a preallocated buffer
+
+    Use the opuslib 3 API (`create_state` and `libopus_decode`).
+    """
+
+    def __init__(self, rate=SAMPLE_RATE, channels=CHANNELS):
+        self.channels = channels
+        self._state = opus.decoder.create_state(rate, channels)
+        self._pcm = (ctypes.c_int16 * (OPUS_MAX_FRAME_SIZE * channels))()
+        self._pcm_pointer = ctypes.cast(self._pcm, opus.c_int16_pointer)
 
-    return decoder_func
+    def decode(self, msg):
+        """Decode an Opus frame to PCM"""
+        samples = opus.decoder.libopus_decode(self._state, msg, len(msg), self._pcm_pointer,
+                                              OPUS_MAX_FRAME_SIZE, 0)
+        if samples < 0:
+            raise PyNuanceError("Opus decoding error {}".format(samples))
+        return ctypes.string_at(self._pcm, samples * self.channels * SAMPLE_WIDTH)
 
 
-def do_synthesis(url, app_id, app_key, language, voice, codec,
-                 input_text, logger):
-    """The TTS function using Nuance Communications services"""
-    audio_player = pyaudio.PyAudio()
+class _AdpcmDecoder(object):  # pylint: disable=R0903
+    """IMA ADPCM decoder, the predictor state is kept between frames"""
 
-    if codec == "speex" and speex is None:
-        print('ERROR: Speex encoding specified but python-speex module unavailable')
-        return
-    elif codec == "opus" and opus is None:
-        print('ERROR: Opus encoding specified but python-opuslib module unavailable')
-        return
+    def __init__(self):
+        self._state = None
 
+    def decode(self, msg):
+        """Decode an ADPCM frame to PCM"""
+        pcm, self._state = audioop.adpcm2lin(msg, SAMPLE_WIDTH, self._state)
+        return pcm
+
+
+def _get_audio_type(codec):
+    """Get the Nuance audio type of a codec"""
     if codec == "speex":
-        audio_type = 'audio/x-speex;mode=wb'
+        if speex is None:
+            raise PyNuanceError("Speex encoding specified but python-speex module unavailable")
+        return 'audio/x-speex;mode=wb'
     elif codec == "opus":
-        audio_type = 'audio/opus;rate=16000'
-    else:
-        audio_type = 'audio/L16;rate=16000'
+        if opus is None:
+            raise PyNuanceError("Opus encoding specified but python-opuslib module unavailable")
+        return 'audio/opus;rate=16000'
+    elif codec == "adpcm":
+        return 'audio/16KADPCM;rate=16000'
+    return 'audio/L16;rate=16000'
 
-    client = WebsocketConnection(url, logger)
-    yield from client.connect(app_id, app_key)
 
-    client.send_message({
-        'message': 'connect',
-        'codec': audio_type,
-        'device_id': 'f0350aa9d98047a4b63d72ca5bfdf509',
-        'user_id': '35228eb1afb54a3f8ba83754445a197c'
-    })
+def _get_decoder_func(audio_type):
+    """Get the function decoding audio frames to PCM, None for raw PCM"""
+    if audio_type == 'audio/L16;rate=16000':
+        return None
+    elif audio_type == 'audio/x-speex;mode=wb':
+        decoder = speex.WBDecoder()  # pylint: disable=E1101  ; I don't know why...
+        return decoder.decode
+    elif audio_type == 'audio/opus;rate=16000':
+        return _OpusDecoder().decode
+    elif audio_type == 'audio/16KADPCM;rate=16000':
+        return _AdpcmDecoder().decode
+    raise PyNuanceError("Need to implement encoding for {}".format(audio_type))
+
+
+def split_sentences(text):
+    """Split a text at sentence boundaries"""
+    return [sentence for sentence in SENTENCE_BOUNDARY.split(text.strip()) if sentence]
+
 
-    _, msg = yield from client.receive()
-    # Should be a connected message
-    logger.debug(msg)
+def send_tts_query(client, language, voice, input_text):
+    """Start a TTS query on a connected client and return its transaction
 
-    # synthesize
+    Several queries can be sent on the same client, the audio of each one
+    is read from its own transaction.
+    """
+    transaction = client.begin_transaction()
     client.send_message({
         'message': 'query_begin',
-        'transaction_id': 123,
+        'transaction_id': transaction.transaction_id,
         'command': 'NVC_TTS_CMD',
         'language': language,
         'tts_voice': voice,
@@ -101,12 +152,12 @@ def do_synthesis(url, app_id, app_key, language, voice, codec,
 
     client.send_message({
         'message': 'query_parameter',
-        'transaction_id': 123,
+        'transaction_id': transaction.transaction_id,
 
         'parameter_name': 'TEXT_TO_READ',
         'parameter_type': 'dictionary',
         'dictionary': {
-            'audio_id': 789,
+            'audio_id': transaction.audio_id,
             'tts_input': input_text,
             'tts_type': 'text'
         }
@@ -114,68 +165,456 @@ def do_synthesis(url, app_id, app_key, language, voice, codec,
 
     client.send_message({
         'message': 'query_end',
-        'transaction_id': 123,
+        'transaction_id': transaction.transaction_id,
     })
+    return transaction
 
-    # Create stream player
-    stream = audio_player.open(format=audio_player.get_format_from_width(2),
-                               # format=p.get_format_from_width(wf.getsampwidth()),
-                               channels=1,
-                               # channels=wf.getnchannels(),
-                               rate=16000,
-                               # rate=wf.getframerate(),
-                               output=True)
 
-    # Prepare decoder
-    if audio_type == 'audio/L16;rate=16000':
-        decoder_func = None
-    elif audio_type == 'audio/x-speex;mode=wb':
-        decoder = speex.WBDecoder()  # pylint: disable=E1101  ; I don't know why...
-        decoder_func = decoder.decode
-    elif audio_type == 'audio/opus;rate=16000':
-        decoder = opus.decoder.create(16000, 1)
-        decoder_func = _get_opus_decoder_func(decoder)
+class SynthesisStream(object):  # pylint: disable=R0902
+    """Async iterator over the PCM chunks of a synthesis
 
-    else:
-        # TODO raise Error
-        print('ERROR: Need to implement encoding for %s!' % audio_type)
-        return
+    Chunks are 16 kHz, 16 bits, mono. The websocket is opened at the first
+    read and released once the server sent `query_end`.
 
-    # Read and play sound
-    while True:
-        msg_type, msg = yield from client.receive()
-        if msg_type == client.MSG_JSON:
-            logger.debug(msg)
+    With a :class:`pynuance.libs.audio_cache.AudioCache`, a cached speech
+    is read as one chunk without connecting, and a complete synthesis is
+    stored in the cache.
+
+    Speex, Opus and ADPCM frames are decoded in `executor` (the default executor
+    of the loop if None), so codec CPU does not block the event loop.
+    """
+
+    def __init__(self, url, app_id, app_key, language, voice,  # pylint: disable=R0913
+                 codec, input_text, logger, pool=None, session=None, cache=None,
+                 executor=None):
+        self.url = url
+        self.app_id = app_id
+        self.app_key = app_key
+        self.language = language
+        self.voice = voice
+        self.audio_type = _get_audio_type(codec)
+        self.input_text = input_text
+        self.logger = logger
+        self.pool = pool
+        self.session = session
+        self.cache = cache
+        self.executor = executor
+        self.cache_key = None
+        if cache is not None:
+            self.cache_key = cache.key(language, voice, codec, input_text)
+        self.client = None
+        self.transaction = None
+        self.done = False
+        self._decoder_func = None
+        self._chunks = []
+
+    @asyncio.coroutine
+    def _start(self):
+        """Connect and send the TTS query"""
+        self._decoder_func = _get_decoder_func(self.audio_type)
+        self.client = yield from acquire_client(self.pool, self.url, self.app_id, self.app_key,
+                                                self.audio_type, self.logger,
+                                                device_id='f0350aa9d98047a4b63d72ca5bfdf509',
+                                                user_id='35228eb1afb54a3f8ba83754445a197c',
+                                                session=self.session)
+        self.transaction = send_tts_query(self.client, self.language, self.voice,
+                                          self.input_text)
+
+    @asyncio.coroutine
+    def _finish(self):
+        """Wait for `query_end` and give back the client
+
+        A `query_error` raises a PyNuanceError, only a complete synthesis is cached.
+        """
+        while True:
+            msg = yield from self.transaction.receive_message()
+            self.logger.debug(msg)
+            if msg['message'] == 'query_error':
+                raise PyNuanceError("Synthesis error: {}".format(msg.get('reason')))
             if msg['message'] == 'query_end':
                 break
-        else:
-            if decoder_func is not None:
-                msg = decoder_func(msg)
-            logger.info("Start sentence")
-            stream.write(msg)
-            logger.info("End sentence")
+        self.done = True
+        release_client(self.pool, self.client)
+        if self.cache is not None and self._chunks:
+            self.cache.set(self.cache_key, b"".join(self._chunks))
 
-    # Close stream and client
-    client.close()
-    stream.stop_stream()
-    stream.close()
-    audio_player.terminate()
+    @asyncio.coroutine
+    def read(self):
+        """Get the next PCM chunk, None at the end of the synthesis"""
+        if self.done:
+            return None
+        if self.client is None and self.cache is not None:
+            audio = self.cache.get(self.cache_key)
+            if audio is not None:
+                self.done = True
+                return audio
+        try:
+            if self.client is None:
+                yield from self._start()
+            msg = yield from self.transaction.receive_audio()
+            if msg is None:
+                yield from self._finish()
+                return None
+            if self._decoder_func is not None:
+                # Frames of a stream are decoded in order, the decoder keeps a state
+                msg = yield from asyncio.get_event_loop().run_in_executor(
+                    self.executor, self._decoder_func, msg)
+        except Exception:
+            self.close()
+            raise
+        if self.cache is not None:
+            self._chunks.append(msg)
+        return msg
 
+    def close(self):
+        """Stop the synthesis, the client is not reused"""
+        if not self.done and self.client is not None:
+            self.client.close()
+        self.done = True
 
-def text_to_speech(app_id, app_key, language, voice, codec, text, logger=None):
-    """Read a text with a given language, voice and code"""
+    def __aiter__(self):
+        return self
+
+    @asyncio.coroutine
+    def __anext__(self):
+        chunk = yield from self.read()
+        if chunk is None:
+            raise StopAsyncIteration
+        return chunk
+
+
+class ParallelSynthesisStream(object):
+    """Async iterator over the PCM chunks of a text synthesized by sentence
+
+    Sentences are synthesized concurrently by :class:`SynthesisStream`, each
+    on its own websocket and at most `parallelism` at the same time. Chunks
+    are read in text order, the first sentence is streamed as soon as it is
+    received while next ones are buffered.
+    """
+
+    def __init__(self, url, app_id, app_key, language, voice,  # pylint: disable=R0913
+                 codec, input_text, logger, pool=None, session=None, cache=None,
+                 executor=None, parallelism=4):
+        self.streams = [SynthesisStream(url, app_id, app_key, language, voice, codec, sentence,
+                                        logger, pool, session, cache, executor)
+                        for sentence in split_sentences(input_text)]
+        self.parallelism = parallelism
+        self.done = False
+        self._queues = [asyncio.Queue() for _ in self.streams]
+        self._tasks = []
+        self._current = 0
+
+    @asyncio.coroutine
+    def _run(self, stream, queue, semaphore):
+        """Read a sentence into its queue, ending with None or the error"""
+        yield from semaphore.acquire()
+        try:
+            while True:
+                chunk = yield from stream.read()
+                queue.put_nowait(chunk)
+                if chunk is None:
+                    break
+        except Exception as exp:  # pylint: disable=W0703
+            queue.put_nowait(exp)
+        finally:
+            semaphore.release()
+
+    @asyncio.coroutine
+    def read(self):
+        """Get the next PCM chunk, None at the end of the text"""
+        if self.done:
+            return None
+        if not self._tasks:
+            # Waiters get the semaphore in order, so sentences start in text order
+            semaphore = asyncio.Semaphore(self.parallelism)
+            self._tasks = [asyncio.ensure_future(self._run(stream, queue, semaphore))
+                           for stream, queue in zip(self.streams, self._queues)]
+        while self._current < len(self._queues):
+            chunk = yield from self._queues[self._current].get()
+            if isinstance(chunk, Exception):
+                self.close()
+                raise chunk
+            if chunk is not None:
+                return chunk
+            self._current += 1
+        self.done = True
+        return None
+
+    def close(self):
+        """Stop all sentences"""
+        for task in self._tasks:
+            task.cancel()
+        for stream in self.streams:
+            stream.close()
+        self.done = True
+
+    def __aiter__(self):
+        return self
+
+    @asyncio.coroutine
+    def __anext__(self):
+        chunk = yield from self.read()
+        if chunk is None:
+            raise StopAsyncIteration
+        return chunk
+
+
+def _open_synthesis(url, app_id, app_key, language, voice,  # pylint: disable=R0913
+                    codec, input_text, logger, pool, session, cache, parallelism):
+    """Get a :class:`ParallelSynthesisStream` if `parallelism` is set, else a SynthesisStream"""
+    if parallelism:
+        return ParallelSynthesisStream(url, app_id, app_key, language, voice, codec, input_text,
+                                       logger, pool, session, cache, parallelism=parallelism)
+    return SynthesisStream(url, app_id, app_key, language, voice, codec, input_text,
+                           logger, pool, session, cache)
+
+
+@asyncio.coroutine
+def do_synthesis(url, app_id, app_key, language, voice, codec,  # pylint: disable=R0913
+                 input_text, logger, pool=None, session=None, cache=None, parallelism=None):
+    """The TTS function using Nuance Communications services
+
+    Audio is played on the sound card by a :class:`pynuance.player.Player`
+    thread while next chunks are received, the player metrics are returned.
+    If `pool` is a :class:`pynuance.websocket.WebsocketPool`, the websocket
+    is taken from it and given back once the synthesis is done. If `cache`
+    is a :class:`pynuance.libs.audio_cache.AudioCache`, repeated texts are
+    played from it. With `parallelism`, sentences are synthesized
+    concurrently, see :class:`ParallelSynthesisStream`.
+    """
+    # PyAudio is only needed to play, not to synthesize
+    from pynuance.player import Player
+
+    synthesis = _open_synthesis(url, app_id, app_key, language, voice, codec, input_text,
+                                logger, pool, session, cache, parallelism)
+
+    with Player(rate=SAMPLE_RATE, channels=CHANNELS) as player:
+        try:
+            while True:
+                msg = yield from synthesis.read()
+                if msg is None:
+                    break
+                yield from player.write(msg)
+        finally:
+            synthesis.close()
+        yield from player.drain()
+
+    logger.info("Time to first audio: %ss, underruns: %s",
+                player.metrics["time_to_first_audio"], player.metrics["underruns"])
+    return player.metrics
+
+
+def synthesize_stream(app_id, app_key, language, voice, codec, text,  # pylint: disable=R0913
+                      logger=None, pool=None, session=None, cache=None, parallelism=None):
+    """Get a :class:`SynthesisStream` of a text, without playing it
+
+    With `parallelism`, get a :class:`ParallelSynthesisStream` instead.
+
+    ::
+
+        @asyncio.coroutine
+        def send_speech(app_id, app_key, text, websocket):
+            synthesis = synthesize_stream(app_id, app_key, "en_US", "Allison", "speex", text)
+            while True:
+                chunk = yield from synthesis.read()
+                if chunk is None:
+                    break
+                websocket.send_bytes(chunk)
+    """
+    if logger is None:
+        logger = logging.getLogger("pynuance").getChild("tts")
+    CATALOG.check_voice(language, voice)
+    return _open_synthesis(URL, app_id, binascii.unhexlify(app_key), language, voice, codec,
+                           text, logger, pool, session, cache, parallelism)
+
+
+@asyncio.coroutine
+def async_synthesize_to_bytes(app_id, app_key, language, voice,  # pylint: disable=R0913
+                              codec, text, logger=None, pool=None, session=None,
+                              cache=None, parallelism=None):
+    """Coroutine returning the PCM of a text"""
+    synthesis = synthesize_stream(app_id, app_key, language, voice, codec, text,
+                                  logger, pool, session, cache, parallelism)
+    chunks = []
+    while True:
+        chunk = yield from synthesis.read()
+        if chunk is None:
+            break
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def synthesize_to_bytes(app_id, app_key, language, voice, codec, text,  # pylint: disable=R0913
+                        logger=None, pool=None, loop=None, cache=None, parallelism=None):
+    """Get the PCM of a text"""
+    if loop is None:
+        loop = get_event_loop()
+    return loop.run_until_complete(async_synthesize_to_bytes(app_id, app_key, language, voice,
+                                                             codec, text, logger=logger,
+                                                             pool=pool, cache=cache,
+                                                             parallelism=parallelism))
+
+
+@asyncio.coroutine
+def async_synthesize_to_file(app_id, app_key, language, voice,  # pylint: disable=R0913
+                             codec, text, file_path, logger=None, pool=None, session=None,
+                             cache=None, parallelism=None):
+    """Coroutine writing the speech of a text in a WAV file
+
+    The file is removed if the synthesis fails.
+    """
+    synthesis = synthesize_stream(app_id, app_key, language, voice, codec, text,
+                                  logger, pool, session, cache, parallelism)
+    try:
+        with wave.open(file_path, "wb") as wav_file:
+            wav_file.setnchannels(CHANNELS)
+            wav_file.setsampwidth(SAMPLE_WIDTH)
+            wav_file.setframerate(SAMPLE_RATE)
+            while True:
+                chunk = yield from synthesis.read()
+                if chunk is None:
+                    break
+                wav_file.writeframes(chunk)
+    except BaseException:
+        # Do not leave a partial or empty WAV file
+        synthesis.close()
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+
+
+def synthesize_to_file(app_id, app_key, language, voice, codec,  # pylint: disable=R0913
+                       text, file_path, logger=None, pool=None, loop=None, cache=None,
+                       parallelism=None):
+    """Write the speech of a text in a WAV file"""
+    if loop is None:
+        loop = get_event_loop()
+    loop.run_until_complete(async_synthesize_to_file(app_id, app_key, language, voice, codec,
+                                                     text, file_path, logger=logger,
+                                                     pool=pool, cache=cache,
+                                                     parallelism=parallelism))
+
+
+@asyncio.coroutine
+def async_text_to_speech(app_id, app_key, language, voice, codec, text,  # pylint: disable=R0913
+                         logger=None, pool=None, session=None, cache=None, parallelism=None):
+    """Coroutine reading a text with a given language, voice and code
+
+    Several calls can run concurrently on the same event loop. Return the
+    playback metrics, see :class:`pynuance.player.Player`. See
+    :func:`do_synthesis` for `parallelism`.
+    """
     if logger is None:
         logger = logging.getLogger("pynuance").getChild("tts")
-    voices_by_lang = dict([(l['code'], l['voice']) for l in LANGUAGES.values()])
-    if language not in voices_by_lang:
-        raise PyNuanceError("Language should be in "
-                            "{}".format(", ".join(voices_by_lang.keys())))
-    if voice not in voices_by_lang[language]:
-        raise PyNuanceError("Voice should be in "
-                            "{}".format(', '.join(voices_by_lang[language])))
-
-    _loop = asyncio.get_event_loop()
-    _loop.run_until_complete(do_synthesis("https://ws.dev.nuance.com/v1/",
-                             app_id, binascii.unhexlify(app_key), language, voice, codec,
-                             text, logger=logger))
-    _loop.stop()
+    CATALOG.check_voice(language, voice)
+
+    return (yield from do_synthesis(URL,
+                                    app_id, binascii.unhexlify(app_key), language, voice, codec,
+                                    text, logger=logger, pool=pool, session=session,
+                                    cache=cache, parallelism=parallelism))
+
+
+def text_to_speech(app_id, app_key, language, voice, codec, text,  # pylint: disable=R0913
+                   logger=None, pool=None, loop=None, cache=None, parallelism=None):
+    """Read a text with a given language, voice and code"""
+    if loop is None:
+        loop = get_event_loop()
+    return loop.run_until_complete(async_text_to_speech(app_id, app_key, language, voice, codec,
+                                                        text, logger=logger, pool=pool,
+                                                        cache=cache, parallelism=parallelism))
+
+
+@asyncio.coroutine
+def async_prewarm_cache(app_id, app_key, language, voice, codec,  # pylint: disable=R0913
+                        phrases, cache, logger=None, pool=None, session=None):
+    """Coroutine synthesizing the phrases missing from `cache`
+
+    Return the number of synthesized phrases.
+    """
+    synthesized = 0
+    for phrase in phrases:
+        if cache.key(language, voice, codec, phrase) in cache:
+            continue
+        yield from async_synthesize_to_bytes(app_id, app_key, language, voice, codec, phrase,
+                                             logger, pool, session, cache)
+        synthesized += 1
+    return synthesized
+
+
+def prewarm_cache(app_id, app_key, language, voice, codec,  # pylint: disable=R0913
+                  phrases, cache, logger=None, pool=None, loop=None):
+    """Fill `cache` with the speech of the phrases"""
+    if loop is None:
+        loop = get_event_loop()
+    return loop.run_until_complete(async_prewarm_cache(app_id, app_key, language, voice, codec,
+                                                       phrases, cache, logger=logger,
+                                                       pool=pool))
+
+
+@asyncio.coroutine
+def _synthesize_job(app_id, app_key, codec, job, file_path,  # pylint: disable=R0913
+                    logger, pool, session, cache):
+    """Synthesize one batch job and report it"""
+    text, voice, language = job
+    result = {"text": text, "voice": voice, "language": language, "file": file_path}
+    start = time.monotonic()
+    try:
+        yield from async_synthesize_to_file(app_id, app_key, language, voice, codec, text,
+                                            file_path, logger, pool, session, cache)
+    except Exception as exp:  # pylint: disable=W0703
+        # One failed job must not stop the batch
+        result["error"] = str(exp)
+    result["latency"] = time.monotonic() - start
+    return result
+
+
+@asyncio.coroutine
+def async_synthesize_batch(app_id, app_key, codec, jobs,  # pylint: disable=R0913
+                           output_dir, concurrency=4, logger=None, pool=None, session=None,
+                           cache=None):
+    """Coroutine writing the speech of (text, voice, language) jobs in WAV files
+
+    At most `concurrency` jobs run at the same time, on websockets reused
+    from `pool` (a new pool is used if None). The file of the n-th job,
+    from 0, is `<output_dir>/<n>.wav` with `n` on 5 digits (`00000.wav`).
+
+    Return, in the order of `jobs`, a dict by job with its `text`, `voice`,
+    `language`, `file`, `latency` in seconds and `error` if it failed.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    own_pool = pool is None
+    if own_pool:
+        pool = WebsocketPool(size=concurrency, session=session)
+    # Read all jobs first, a failing iterator must not stop one worker only
+    jobs = iter(list(enumerate(jobs)))
+    results = {}
+
+    @asyncio.coroutine
+    def worker():
+        """Run jobs until there is none left"""
+        for index, job in jobs:
+            file_path = os.path.join(output_dir, "{:05d}.wav".format(index))
+            results[index] = yield from _synthesize_job(app_id, app_key, codec, job, file_path,
+                                                        logger, pool, session, cache)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+    try:
+        yield from asyncio.gather(*workers)
+    finally:
+        # Stop the other workers before closing the pool
+        for task in workers:
+            task.cancel()
+        if own_pool:
+            pool.close()
+    return [results[index] for index in sorted(results)]
+
+
+def synthesize_batch(app_id, app_key, codec, jobs, output_dir,  # pylint: disable=R0913
+                     concurrency=4, logger=None, pool=None, loop=None, cache=None):
+    """Write the speech of (text, voice, language) jobs in WAV files"""
+    if loop is None:
+        loop = get_event_loop()
+    return loop.run_until_complete(async_synthesize_batch(app_id, app_key, codec, jobs,
+                                                          output_dir, concurrency,
+                                                          logger=logger, pool=pool,
+                                                          cache=cache))
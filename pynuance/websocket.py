@@ -3,12 +3,17 @@
 import asyncio
 import base64
 import binascii
+import collections
 import email
+import functools
 import hashlib
 import hmac
-import json
+import itertools
+import logging
 import os
 import datetime
+import ssl
+import time
 import urllib.parse
 
 import aiohttp
@@ -17,50 +22,258 @@ try:
 except ImportError:
     from aiohttp import _ws_impl as websocket
 
+from pynuance.libs.clock_skew import CLOCK_SKEW_CACHE
+from pynuance.libs import serializer as serializers
+
 
 # This is a fixed string (constant), used in the Websockets protocol handshake
 # in order to establish a conversation
 WS_KEY = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
 
+# Default size of the JSON and audio queues of a transaction
+QUEUE_SIZE = 256
+
+# Default high-water mark (bytes) of the websocket write buffer
+WRITE_BUFFER_HIGH = 64 * 1024
+
+# Put on the queues when the connection reader fails
+_READER_ERROR = object()
+
+
+class CachingTCPConnector(aiohttp.TCPConnector):
+    """TCP connector caching DNS lookups for `dns_ttl` seconds"""
+
+    def __init__(self, *, dns_ttl=300, **kwargs):
+        super().__init__(resolve=True, **kwargs)
+        self.dns_ttl = dns_ttl
+        self._resolved_at = {}
+
+    @asyncio.coroutine
+    def _resolve_host(self, host, port):
+        key = (host, port)
+        now = time.monotonic()
+        expired = now - self._resolved_at.get(key, -self.dns_ttl - 1) > self.dns_ttl
+        if expired:
+            self.clear_resolved_hosts(host, port)
+        hosts = yield from super()._resolve_host(host, port)
+        if expired:
+            self._resolved_at[key] = now
+        return hosts
+
+
+def create_session(loop=None, limit=None, dns_ttl=300,  # pylint: disable=R0913
+                   keepalive_timeout=30, ssl_context=None):
+    """Create a session for websocket handshakes
+
+    :param int limit: Maximum simultaneous connections by endpoint
+    :param float dns_ttl: Seconds DNS lookups are cached
+    :param float keepalive_timeout: Seconds an unused HTTP connection is kept
+    :param ssl_context: SSL context shared by all TLS connections
+    """
+    if loop is None:
+        loop = asyncio.get_event_loop()
+    if ssl_context is None:
+        ssl_context = ssl.create_default_context()
+    connector = CachingTCPConnector(loop=loop, limit=limit, dns_ttl=dns_ttl,
+                                    keepalive_timeout=keepalive_timeout,
+                                    ssl_context=ssl_context)
+    return aiohttp.ClientSession(connector=connector, loop=loop)
+
+
+_SESSION = None
+
+
+def get_session(loop=None):
+    """Get the long-lived session shared by websocket connections"""
+    global _SESSION  # pylint: disable=W0603
+    if loop is None:
+        loop = asyncio.get_event_loop()
+    if _SESSION is None or _SESSION.closed or _SESSION._loop is not loop:
+        _SESSION = create_session(loop)
+    return _SESSION
+
 
-def connection_handshake(client):
+@functools.lru_cache(maxsize=64)
+def _handshake_frames(serializer, transaction_id, audio_id):
+    """Encode the handshake messages of a transaction
+
+    IDs restart at 1 on each connection, so these frames are encoded once
+    and reused by every session.
+    """
+    return (
+        serializer.dumps({
+            'message': 'query_parameter',
+            'transaction_id': transaction_id,
+
+            'parameter_name': 'AUDIO_INFO',
+            'parameter_type': 'audio',
+
+            'audio_id': audio_id
+        }),
+        serializer.dumps({
+            'message': 'query_end',
+            'transaction_id': transaction_id,
+        }),
+        serializer.dumps({
+            'message': 'audio',
+            'audio_id': audio_id,
+        }),
+    )
+
+
+def connection_handshake(transaction):
     """Nuance connection handshake.
 
     Use for STT and NLU audio.
     """
-    client.send_message({
-        'message': 'query_parameter',
-        'transaction_id': 123,
+    client = transaction.client
+    for frame in _handshake_frames(client.serializer, transaction.transaction_id,
+                                   transaction.audio_id):
+        client.send_encoded(frame)
 
-        'parameter_name': 'AUDIO_INFO',
-        'parameter_type': 'audio',
 
-        'audio_id': 456
-    })
+class _FrameIterator(object):
+    """Async iterator calling `get` until it returns None"""
 
-    client.send_message({
-        'message': 'query_end',
-        'transaction_id': 123,
-    })
+    def __init__(self, get):
+        self._get = get
 
-    client.send_message({
-        'message': 'audio',
-        'audio_id': 456,
-    })
+    def __aiter__(self):
+        return self
 
+    @asyncio.coroutine
+    def __anext__(self):
+        item = yield from self._get()
+        if item is None:
+            raise StopAsyncIteration
+        return item
 
-class AbstractWebsocketConnection(object):  # pylint: disable=R0801
-    """WebSocket connection object to handle Nuance server communications"""
+
+class FrameChannel(object):
+    """Bounded JSON and audio queues fed by a connection reader
+
+    With `blocking`, a full queue stops the reader until the consumer
+    catches up. Otherwise the oldest frame is dropped.
+    """
+
+    def __init__(self, maxsize=QUEUE_SIZE, blocking=True):
+        self.json_queue = asyncio.Queue(maxsize=maxsize)
+        self.audio_queue = asyncio.Queue(maxsize=maxsize)
+        self.blocking = blocking
+        self.dropped = 0
+        self.exception = None
+
+    @asyncio.coroutine
+    def put(self, queue, item):
+        """Push a decoded frame"""
+        if self.blocking:
+            yield from queue.put(item)
+            return
+        if queue.full():
+            queue.get_nowait()
+            self.dropped += 1
+        queue.put_nowait(item)
+
+    def set_exception(self, exp):
+        """Make consumers raise `exp` once the queues are drained"""
+        self.exception = exp
+        for queue in (self.json_queue, self.audio_queue):
+            if not queue.full():
+                queue.put_nowait(_READER_ERROR)
+
+    @asyncio.coroutine
+    def _get(self, queue):
+        """Get a frame or raise the reader error"""
+        if self.exception is not None and queue.empty():
+            raise self.exception
+        item = yield from queue.get()
+        if item is _READER_ERROR:
+            raise self.exception
+        return item
+
+    @asyncio.coroutine
+    def receive_message(self):
+        """Get the next JSON message"""
+        return (yield from self._get(self.json_queue))
+
+    @asyncio.coroutine
+    def receive_audio(self):
+        """Get the next audio frame"""
+        return (yield from self._get(self.audio_queue))
+
+
+class Transaction(FrameChannel):
+    """Nuance query running on a websocket connection
+
+    The connection reader routes every frame of this query to its queues,
+    so several transactions can share the same websocket. Audio frames end
+    with None once the server sent `audio_end` or `query_end`.
+    """
+
+    def __init__(self, client, transaction_id, audio_id, maxsize=QUEUE_SIZE):
+        FrameChannel.__init__(self, maxsize)
+        self.client = client
+        self.transaction_id = transaction_id
+        self.audio_id = audio_id
+        self.audio_done = False
+        self.finished = False
+
+    @asyncio.coroutine
+    def _next_message(self):
+        """Get the next JSON message, None after `query_end`"""
+        if self.finished and self.json_queue.empty():
+            return None
+        msg = yield from self.receive_message()
+        if msg['message'] == 'query_end':
+            return None
+        return msg
+
+    def messages(self):
+        """Async iterator over JSON messages until `query_end`"""
+        return _FrameIterator(self._next_message)
+
+    def audio(self):
+        """Async iterator over audio frames"""
+        return _FrameIterator(self.receive_audio)
+
+    def close(self):
+        """Stop routing frames to this transaction"""
+        self.client.end_transaction(self)
+
+
+class AbstractWebsocketConnection(object):  # pylint: disable=R0801,R0902
+    """WebSocket connection object to handle Nuance server communications
+
+    Once connected, one reader task decodes every frame and pushes it on the
+    queues of its :class:`Transaction`, frames without transaction go to
+    :meth:`receive`.
+    """
     MSG_JSON = 1
     MSG_AUDIO = 2
 
-    def __init__(self, url, logger):
+    def __init__(self, url, logger, session=None,  # pylint: disable=R0913
+                 write_buffer_high=WRITE_BUFFER_HIGH, serializer=None):
         self.url = url
         self.logger = logger
+        self.session = session
+        if serializer is None:
+            serializer = serializers.DEFAULT_SERIALIZER
+        self.serializer = serializer
+        self.write_buffer_high = write_buffer_high
         self.connection = None
         self.response = None
         self.stream = None
         self.writer = None
+        self.pool_key = None
+        self.pool_permit = None
+        # Transaction demultiplexing
+        self.transactions = collections.OrderedDict()
+        self._audio_transactions = {}
+        self._audio_transaction = None
+        self._transaction_ids = itertools.count(1)
+        self._audio_ids = itertools.count(1)
+        self.unrouted = FrameChannel(blocking=False)
+        self._reader_task = None
 
     @asyncio.coroutine
     def connect(self, app_id, app_key, use_plaintext=True):
@@ -68,36 +281,197 @@ class AbstractWebsocketConnection(object):  # pylint: disable=R0801
         raise NotImplementedError
 
     @asyncio.coroutine
-    def receive(self):
-        """Handle server response"""
+    def _upgrade_request(self, params, sec_key):
+        """Send the websocket upgrade request on the shared session"""
+        session = self.session
+        if session is None:
+            session = get_session()
+        response = yield from session.request(
+            'get', self.url + '?' + urllib.parse.urlencode(params),
+            headers={
+                'UPGRADE': 'WebSocket',
+                'CONNECTION': 'Upgrade',
+                'SEC-WEBSOCKET-VERSION': '13',
+                'SEC-WEBSOCKET-KEY': sec_key.decode(),
+            })
+        return response
+
+    @asyncio.coroutine
+    def _read_frame(self):
+        """Read and decode one frame from the websocket"""
         wsmsg = yield from self.stream.read()
+        if wsmsg.tp == websocket.MSG_CLOSE:
+            raise aiohttp.errors.ServerDisconnectedError(wsmsg.data)
         if wsmsg.tp == 1:
-            return (self.MSG_JSON, json.loads(wsmsg.data))
+            return (self.MSG_JSON, self.serializer.loads(wsmsg.data))
 
         return (self.MSG_AUDIO, wsmsg.data)
 
+    @asyncio.coroutine
+    def receive(self):
+        """Handle server response which does not belong to a transaction"""
+        msg = yield from self.unrouted.receive_message()
+        return (self.MSG_JSON, msg)
+
+    def begin_transaction(self):
+        """Allocate transaction and audio IDs for a new query"""
+        transaction = Transaction(self, next(self._transaction_ids), next(self._audio_ids))
+        self.transactions[transaction.transaction_id] = transaction
+        self._audio_transactions[transaction.audio_id] = transaction
+        return transaction
+
+    def end_transaction(self, transaction):
+        """Forget a transaction"""
+        self.transactions.pop(transaction.transaction_id, None)
+        self._audio_transactions.pop(transaction.audio_id, None)
+        if self._audio_transaction is transaction:
+            self._audio_transaction = None
+
+    @asyncio.coroutine
+    def _read_loop(self):
+        """Read frames and route them to their transaction"""
+        try:
+            while True:
+                msg_type, msg = yield from self._read_frame()
+                yield from self._dispatch(msg_type, msg)
+        except Exception as exp:  # pylint: disable=W0703
+            # Wake up everybody waiting on this connection
+            for transaction in list(self.transactions.values()):
+                transaction.set_exception(exp)
+                self.end_transaction(transaction)
+            self.unrouted.set_exception(exp)
+
+    @asyncio.coroutine
+    def _dispatch(self, msg_type, msg):
+        """Push a frame on the queues of its transaction"""
+        if msg_type == self.MSG_AUDIO:
+            transaction = self._audio_transaction
+            if transaction is None and self.transactions:
+                # No audio_begin seen, the oldest pending query gets the audio
+                transaction = next(iter(self.transactions.values()))
+            channel = transaction if transaction is not None else self.unrouted
+            yield from channel.put(channel.audio_queue, msg)
+            return
+
+        transaction = self.transactions.get(msg.get('transaction_id'))
+        if transaction is None:
+            transaction = self._audio_transactions.get(msg.get('audio_id'))
+        if transaction is None:
+            yield from self.unrouted.put(self.unrouted.json_queue, msg)
+            return
+
+        message = msg.get('message')
+        if message == 'audio_begin':
+            self._audio_transaction = transaction
+        yield from transaction.put(transaction.json_queue, msg)
+        if message in ('audio_end', 'query_end') and not transaction.audio_done:
+            if transaction is self._audio_transaction:
+                self._audio_transaction = None
+            transaction.audio_done = True
+            yield from transaction.put(transaction.audio_queue, None)
+        if message == 'query_end':
+            transaction.finished = True
+            self.end_transaction(transaction)
+
+    @asyncio.coroutine
+    def nuance_connect(self, audio_type, device_id, user_id=None):
+        """Send the Nuance `connect` message and wait for `connected`"""
+        msg = {
+            'message': 'connect',
+            'device_id': device_id,
+            'codec': audio_type,
+        }
+        if user_id is not None:
+            msg['user_id'] = user_id
+        self.send_message(msg)
+
+        _, msg = yield from self.receive()
+        # Should be a connected message
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(msg)
+        return msg
+
+    def is_healthy(self):
+        """Check if the connection can still carry a new query"""
+        if self.connection is None or self.connection.closed:
+            return False
+        if self.stream.exception() is not None or self.stream.is_eof():
+            return False
+        if self.transactions:
+            return False
+        if self._reader_task is None or self._reader_task.done():
+            return False
+        # Any pending frame on an idle connection is an error or a close frame
+        return self.unrouted.json_queue.empty() and self.unrouted.audio_queue.empty()
+
     def send_message(self, msg):
         """Send json message to the server"""
-        self.logger.debug(msg)
-        self.writer.send(json.dumps(msg))
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(msg)
+        self.writer.send(self.serializer.dumps(msg))
+
+    def send_encoded(self, data):
+        """Send a json message already encoded with :attr:`serializer`"""
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(data)
+        self.writer.send(data)
 
     def send_audio(self, audio):
         """Send audio to the server"""
         self.writer.send(audio, binary=True)
 
+    @property
+    def buffered_bytes(self):
+        """Bytes waiting in the transport write buffer"""
+        if self.connection is None or self.connection.closed:
+            return 0
+        return self.connection.writer.transport.get_write_buffer_size()
+
+    @asyncio.coroutine
+    def drain(self):
+        """Wait until the write buffer is below its high-water mark"""
+        yield from self.connection.writer.drain()
+
+    @asyncio.coroutine
+    def write_message(self, msg):
+        """Send json message to the server, slowing down on a slow uplink"""
+        self.send_message(msg)
+        yield from self.drain()
+
+    @asyncio.coroutine
+    def write_audio(self, audio):
+        """Send audio to the server, slowing down on a slow uplink"""
+        self.send_audio(audio)
+        yield from self.drain()
+
     def close(self):
         """Close WebSocket connection"""
+        if self.pool_permit is not None:
+            # Free the slot of this connection in its pool
+            self.pool_permit.release()
+            self.pool_permit = None
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        if self.connection is None or self.connection.closed:
+            return
         self.writer.close()
-        self.response.close()
+        # Close the upgraded socket before the response can give it back
+        # to the keep-alive pool of the session
         self.connection.close()
+        self.response.close(force=True)
 
     @staticmethod
+    @asyncio.coroutine
     def _handle_response_101(response):
         """handle response"""
         info = "%s %s\n" % (response.status, response.reason)
         for (key, val) in response.headers.items():
             info += '%s: %s\n' % (key, val)
-        info += '\n%s' % (yield from response.read()).decode('utf-8')
+        try:
+            info += '\n%s' % (yield from response.read()).decode('utf-8')
+        finally:
+            # Give the HTTP connection back to the session
+            response.close()
 
         if response.status == 401:
             raise RuntimeError("Authorization failure:\n%s" % info)
@@ -122,14 +496,18 @@ class AbstractWebsocketConnection(object):  # pylint: disable=R0801
         self.connection = response.connection
         self.stream = self.connection.reader.set_parser(websocket.WebSocketParser)
         self.writer = websocket.WebSocketWriter(self.connection.writer)
+        self.connection.writer.transport.set_write_buffer_limits(high=self.write_buffer_high)
         self.response = response
+        self._reader_task = asyncio.ensure_future(self._read_loop())
 
 
 class BadWebsocketConnection(AbstractWebsocketConnection):
     """WebSocket connection object to handle Nuance server communications"""
 
-    def __init__(self, url, logger):
-        AbstractWebsocketConnection.__init__(self, url, logger)
+    def __init__(self, url, logger, session=None,  # pylint: disable=R0913
+                 write_buffer_high=WRITE_BUFFER_HIGH, serializer=None):
+        AbstractWebsocketConnection.__init__(self, url, logger, session, write_buffer_high,
+                                             serializer)
 
     @asyncio.coroutine
     def connect(self, app_id, app_key, use_plaintext=True):
@@ -138,30 +516,41 @@ class BadWebsocketConnection(AbstractWebsocketConnection):
 
         params = {'app_id': app_id, 'algorithm': 'key', 'app_key': binascii.hexlify(app_key)}
 
-        response = yield from aiohttp.request('get',
-                                              self.url + '?' + urllib.parse.urlencode(params),
-                                              headers={'UPGRADE': 'WebSocket',
-                                                       'CONNECTION': 'Upgrade',
-                                                       'SEC-WEBSOCKET-VERSION': '13',
-                                                       'SEC-WEBSOCKET-KEY': sec_key.decode(),
-                                                       })
+        response = yield from self._upgrade_request(params, sec_key)
 
         if response.status != 101:
-            self._handle_response_101(response)
+            yield from self._handle_response_101(response)
 
         self._handshake(response, sec_key)
 
 
 class WebsocketConnection(AbstractWebsocketConnection):
-    """Websocket client"""
+    """Websocket client
 
-    def __init__(self, url, logger):
-        AbstractWebsocketConnection.__init__(self, url, logger)
+    `clock_skew` is the :class:`pynuance.libs.clock_skew.ClockSkewCache`
+    used to sign HMAC connections with the server date and `session` the
+    :class:`aiohttp.ClientSession` used for the handshake (the shared one
+    from :func:`get_session` by default). `serializer` is the
+    :class:`pynuance.libs.serializer.JsonSerializer` of the messages.
+    """
+
+    def __init__(self, url, logger, clock_skew=None, session=None,  # pylint: disable=R0913
+                 write_buffer_high=WRITE_BUFFER_HIGH, serializer=None):
+        AbstractWebsocketConnection.__init__(self, url, logger, session, write_buffer_high,
+                                             serializer)
+        if clock_skew is None:
+            clock_skew = CLOCK_SKEW_CACHE
+        self.clock_skew = clock_skew
 
     @asyncio.coroutine
     def connect(self, app_id, app_key, use_plaintext=True):
         """Connect to the websocket"""
-        date = datetime.datetime.utcnow()
+        now = datetime.datetime.utcnow()
+        date = now
+        if not use_plaintext:
+            cached_delta = self.clock_skew.get(self.url)
+            if cached_delta is not None:
+                date = now + cached_delta
         sec_key = base64.b64encode(os.urandom(16))
 
         if use_plaintext:
@@ -179,31 +568,27 @@ class WebsocketConnection(AbstractWebsocketConnection):
                 'signature': self.sign_credentials(datestr, app_key, app_id),
             }
 
-        response = yield from aiohttp.request(
-            'get', self.url + '?' + urllib.parse.urlencode(params),
-            headers={
-                'UPGRADE': 'WebSocket',
-                'CONNECTION': 'Upgrade',
-                'SEC-WEBSOCKET-VERSION': '13',
-                'SEC-WEBSOCKET-KEY': sec_key.decode(),
-            })
+        response = yield from self._upgrade_request(params, sec_key)
 
         if response.status == 401 and not use_plaintext:
             if 'Date' in response.headers:
                 server_date = email.utils.parsedate_to_datetime(response.headers['Date'])
                 if server_date.tzinfo is not None:
                     server_date = (server_date - server_date.utcoffset()).replace(tzinfo=None)
+                # Free the keep-alive connection for the retry
+                yield from response.release()
             else:
                 server_date = yield from response.read()
                 server_date = datetime.datetime.strptime(server_date[:19].decode('ascii'),
                                                          "%Y-%m-%dT%H:%M:%S")
 
             # Use delta on future requests
-            date_delta = server_date - date
+            date_delta = server_date - now
+            self.clock_skew.set(self.url, date_delta)
 
-            print("Retrying authorization (delta=%s)" % date_delta)
+            self.logger.info("Retrying authorization (delta=%s)", date_delta)
 
-            datestr = (date + date_delta).replace(microsecond=0).isoformat()
+            datestr = (now + date_delta).replace(microsecond=0).isoformat()
             params = {
                 'date': datestr,
                 'algorithm': 'HMAC-SHA-256',
@@ -211,16 +596,10 @@ class WebsocketConnection(AbstractWebsocketConnection):
                 'signature': self.sign_credentials(datestr, app_key, app_id),
             }
 
-            response = yield from aiohttp.request('get',
-                                                  self.url + '?' + urllib.parse.urlencode(params),
-                                                  headers={'UPGRADE': 'WebSocket',
-                                                           'CONNECTION': 'Upgrade',
-                                                           'SEC-WEBSOCKET-VERSION': '13',
-                                                           'SEC-WEBSOCKET-KEY': sec_key.decode(),
-                                                           })
+            response = yield from self._upgrade_request(params, sec_key)
 
         if response.status != 101:
-            self._handle_response_101(response)
+            yield from self._handle_response_101(response)
 
         self._handshake(response, sec_key)
 
@@ -229,3 +608,205 @@ class WebsocketConnection(AbstractWebsocketConnection):
         """Handle credentials"""
         value = datestr.encode('ascii') + b' ' + app_id.encode('utf-8')
         return hmac.new(app_key, value, hashlib.sha256).hexdigest()
+
+
+class PrewarmedClient(object):
+    """Stand-in client buffering audio while the real query is being opened
+
+    `begin` is a coroutine returning the (client, transaction) of a started
+    audio query. It runs in the background while the microphone is already
+    captured; audio written before it is done is kept locally and flushed,
+    in order, as soon as the websocket is ready.
+
+    It can also be given as the transaction of
+    :func:`pynuance.recorder.listen_microphone`, see :attr:`finished`.
+    """
+
+    def __init__(self, begin, loop=None):
+        self.begin_task = asyncio.ensure_future(begin, loop=loop)
+        self.client = None
+        self.transaction = None
+        self._pending = []
+
+    @asyncio.coroutine
+    def wait_ready(self):
+        """Wait for the query to be started and flush buffered audio"""
+        if self.client is None:
+            self.client, self.transaction = yield from self.begin_task
+            for audio in self._pending:
+                self.client.send_audio(audio)
+            self._pending = []
+            yield from self.client.drain()
+        return (self.client, self.transaction)
+
+    @property
+    def finished(self):
+        """True once the server ended the query"""
+        return self.transaction is not None and self.transaction.finished
+
+    @asyncio.coroutine
+    def write_audio(self, audio):
+        """Send audio, or buffer it if the websocket is not ready yet"""
+        if self.client is None and not self.begin_task.done():
+            self._pending.append(audio)
+            return
+        yield from self.wait_ready()
+        yield from self.client.write_audio(audio)
+
+    def close(self):
+        """Close the real client or stop opening it"""
+        if self.client is not None:
+            self.client.close()
+        elif not self.begin_task.done():
+            self.begin_task.cancel()
+        elif not self.begin_task.cancelled() and self.begin_task.exception() is None:
+            # Opened but never used
+            self.begin_task.result()[0].close()
+
+
+@asyncio.coroutine
+def connect_client(url, app_id, app_key, audio_type, logger,  # pylint: disable=R0913
+                   device_id, user_id=None, use_plaintext=True, session=None,
+                   serializer=None, clock_skew=None):
+    """Open a websocket and send the Nuance `connect` message
+
+    `clock_skew` is the :class:`pynuance.libs.clock_skew.ClockSkewCache` signing
+    HMAC connections, the in-memory module cache by default.
+    """
+    client = WebsocketConnection(url, logger, clock_skew=clock_skew, session=session,
+                                 serializer=serializer)
+    yield from client.connect(app_id, app_key, use_plaintext)
+    try:
+        yield from client.nuance_connect(audio_type, device_id, user_id)
+    except BaseException:
+        # Do not leak the socket and its reader task
+        client.close()
+        raise
+    return client
+
+
+class WebsocketPool(object):
+    """Pool of connected Nuance websockets
+
+    Connections are keyed by (url, app_id, audio_type, device_id, user_id),
+    the values sent in the Nuance `connect` message. Idle connections
+    already went through the websocket upgrade and the `connect` message,
+    so getting one from the pool only costs a health check.
+
+    `size` only caps the idle connections. With `max_connections`,
+    :meth:`acquire` also waits while that many connections of the same key
+    are in use, until one is released or closed.
+
+    :param int size: Maximum number of idle connections kept by key
+    :param float idle_timeout: Seconds before an idle connection is closed
+    :param session: :class:`aiohttp.ClientSession` used to open connections
+    :param serializer: :class:`pynuance.libs.serializer.JsonSerializer` of the connections
+    :param int max_connections: Maximum number of connections in use by key
+    :param clock_skew: :class:`pynuance.libs.clock_skew.ClockSkewCache` of the connections
+    """
+
+    def __init__(self, size=4, idle_timeout=30, session=None,  # pylint: disable=R0913
+                 serializer=None, max_connections=None, clock_skew=None):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.session = session
+        self.serializer = serializer
+        self.max_connections = max_connections
+        self.clock_skew = clock_skew
+        self._idle = {}
+        self._permits = {}
+
+    @asyncio.coroutine
+    def acquire(self, url, app_id, app_key, audio_type, logger,  # pylint: disable=R0913
+                device_id, user_id=None, use_plaintext=True):
+        """Get a connected client from the pool or open a new one"""
+        key = (url, app_id, audio_type, device_id, user_id)
+        permit = None
+        if self.max_connections is not None:
+            permit = self._permits.get(key)
+            if permit is None:
+                permit = self._permits[key] = asyncio.Semaphore(self.max_connections)
+            yield from permit.acquire()
+        try:
+            self.evict_idle()
+            idle = self._idle.get(key, [])
+            client = None
+            while idle:
+                _, candidate = idle.pop()
+                if candidate.is_healthy():
+                    client = candidate
+                    client.logger = logger
+                    break
+                candidate.close()
+
+            if client is None:
+                client = yield from connect_client(url, app_id, app_key, audio_type, logger,
+                                                   device_id, user_id, use_plaintext,
+                                                   self.session, self.serializer,
+                                                   self.clock_skew)
+                client.pool_key = key
+        except BaseException:
+            if permit is not None:
+                permit.release()
+            raise
+        client.pool_permit = permit
+        return client
+
+    def release(self, client):
+        """Give back a client after its query received `query_end`"""
+        permit, client.pool_permit = client.pool_permit, None
+        idle = self._idle.setdefault(client.pool_key, [])
+        if not client.is_healthy() or len(idle) >= self.size:
+            client.close()
+        else:
+            idle.append((time.monotonic(), client))
+        if permit is not None:
+            permit.release()
+
+    @staticmethod
+    def discard(client):
+        """Close a client which must not be reused"""
+        client.close()
+
+    def evict_idle(self):
+        """Close idle connections which are too old or broken"""
+        now = time.monotonic()
+        for key, idle in self._idle.items():
+            kept = []
+            for last_used, client in idle:
+                if now - last_used < self.idle_timeout and client.is_healthy():
+                    kept.append((last_used, client))
+                else:
+                    client.close()
+            self._idle[key] = kept
+
+    def close(self):
+        """Close all idle connections"""
+        for idle in self._idle.values():
+            for _, client in idle:
+                client.close()
+        self._idle = {}
+
+
+@asyncio.coroutine
+def acquire_client(pool, url, app_id, app_key, audio_type, logger,  # pylint: disable=R0913
+                   device_id, user_id=None, use_plaintext=True, session=None,
+                   clock_skew=None):
+    """Get a connected client, from `pool` if it is not None
+
+    Pooled clients use the `clock_skew` of their pool.
+    """
+    if pool is None:
+        return (yield from connect_client(url, app_id, app_key, audio_type, logger,
+                                          device_id, user_id, use_plaintext, session,
+                                          clock_skew=clock_skew))
+    return (yield from pool.acquire(url, app_id, app_key, audio_type, logger,
+                                    device_id, user_id, use_plaintext))
+
+
+def release_client(pool, client):
+    """Close `client` or give it back to `pool` if it is not None"""
+    if pool is None:
+        client.close()
+    else:
+        pool.release(client)
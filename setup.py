@@ -31,6 +31,7 @@ setup(name='pynuance',
                         "speex==0.9.1",
                         ],
       extras_require={
+        'opus': ["opuslib>=3.0.1"],
         'tests': ["pycodestyle==2.3.1",
                   "pytest==3.1.3",
                   "pytest-cov==2.5.1",
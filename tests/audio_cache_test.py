@@ -0,0 +1,53 @@
+import os
+import time
+
+from pynuance.libs.audio_cache import AudioCache
+
+
+class TestAudioCache(object):
+
+    def test_key(self):
+        key = AudioCache.key("en_US", "Allison", "speex", "Hello")
+        assert key == AudioCache.key("en_US", "Allison", "speex", "Hello")
+        assert key != AudioCache.key("en_US", "Allison", "opus", "Hello")
+        assert key != AudioCache.key("en_US", "Tom", "speex", "Hello")
+
+    def test_memory_lru(self):
+        cache = AudioCache(max_memory_bytes=30)
+        cache.set("a", b"a" * 10)
+        cache.set("b", b"b" * 10)
+        cache.set("c", b"c" * 10)
+        assert cache.get("a") == b"a" * 10
+        # "b" is the least recently used
+        cache.set("d", b"d" * 10)
+        assert cache.get("b") is None
+        assert cache.get("a") == b"a" * 10
+        assert cache.stats == {"memory_hits": 2, "disk_hits": 0, "misses": 1}
+
+    def test_disk_tier(self, tmpdir):
+        directory = str(tmpdir)
+        AudioCache(directory=directory).set("a", b"audio")
+        cache = AudioCache(directory=directory)
+        assert "a" in cache
+        assert cache.get("a") == b"audio"
+        assert cache.get("a") == b"audio"
+        assert cache.stats == {"memory_hits": 1, "disk_hits": 1, "misses": 0}
+
+    def test_disk_eviction(self, tmpdir):
+        directory = str(tmpdir)
+        cache = AudioCache(max_memory_bytes=0, directory=directory, max_disk_bytes=25)
+        cache.set("a", b"a" * 10)
+        cache.set("b", b"b" * 10)
+        past = time.time() - 60
+        os.utime(os.path.join(directory, "b.pcm"), (past, past))
+        cache.set("c", b"c" * 10)
+        assert "a" in cache
+        assert "b" not in cache
+        assert "c" in cache
+
+    def test_clear(self, tmpdir):
+        cache = AudioCache(directory=str(tmpdir))
+        cache.set("a", b"audio")
+        cache.clear()
+        assert "a" not in cache
+        assert os.listdir(str(tmpdir)) == []
@@ -0,0 +1,190 @@
+import array
+import asyncio
+import threading
+
+import pytest
+
+from pynuance.libs.audio import (AudioQueue, BLOCK, DROP_NEWEST, DROP_OLDEST, EncoderStage,
+                                 RingBuffer, downmix)
+
+
+class TestRingBuffer(object):
+
+    def test_fifo(self):
+        buffer = RingBuffer(8)
+        buffer.write(b"abcdef")
+        assert bytes(buffer.read(4)) == b"abcd"
+        # Wraps around the end
+        buffer.write(b"ghijk")
+        assert len(buffer) == 7
+        assert buffer.peek() == b"efghijk"
+        assert bytes(buffer.read(7)) == b"efghijk"
+        assert len(buffer) == 0
+        assert buffer.capacity == 8
+
+    def test_grow(self):
+        buffer = RingBuffer(4)
+        buffer.write(b"abc")
+        buffer.read(2)
+        buffer.write(b"defghi")
+        assert buffer.capacity >= 7
+        assert bytes(buffer.read(10)) == b"cdefghi"
+
+    def test_long_stream(self):
+        buffer = RingBuffer(640)
+        data = bytes(range(256)) * 100
+        output = bytearray()
+        for i in range(0, len(data), 300):
+            buffer.write(data[i:i + 300])
+            while len(buffer) >= 320:
+                output += buffer.read(320)
+        output += buffer.read(len(buffer))
+        assert bytes(output) == data
+        assert buffer.capacity == 640
+
+
+class TestDownmix(object):
+
+    def test_mono(self):
+        assert downmix(b"\x01\x02\x03\x04", 1) == b"\x01\x02\x03\x04"
+
+    def test_average(self):
+        stereo = array.array('h', [100, 300, -200, -400, 1000, 0]).tobytes()
+        assert array.array('h', downmix(stereo, 2)).tolist() == [200, -300, 500]
+        four = array.array('h', [100, 200, 300, 400]).tobytes()
+        assert array.array('h', downmix(four, 4)).tolist() == [250]
+
+    def test_select(self):
+        stereo = array.array('h', [100, 300, -200, -400]).tobytes()
+        assert array.array('h', downmix(stereo, 2, 1)).tolist() == [300, -400]
+
+
+class TestAudioQueue(object):
+
+    def setup_method(self):
+        self.loop = asyncio.new_event_loop()
+
+    def teardown_method(self):
+        self.loop.close()
+
+    def run(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def test_drop_oldest(self):
+        audio_queue = AudioQueue(2, DROP_OLDEST, self.loop)
+        for audio in (b"a", b"b", b"c"):
+            audio_queue.put_nowait(audio)
+        assert audio_queue.depth == 2
+        assert audio_queue.dropped == 1
+        assert self.run(audio_queue.get()) == b"b"
+        assert self.run(audio_queue.get()) == b"c"
+
+    def test_drop_newest(self):
+        audio_queue = AudioQueue(2, DROP_NEWEST, self.loop)
+        for audio in (b"a", b"b", b"c"):
+            audio_queue.put_nowait(audio)
+        assert audio_queue.dropped == 1
+        assert self.run(audio_queue.get()) == b"a"
+        assert self.run(audio_queue.get()) == b"b"
+        assert audio_queue.max_depth == 2
+
+    def test_block(self):
+        audio_queue = AudioQueue(1, BLOCK, self.loop)
+
+        def capture():
+            for audio in (b"a", b"b", b"c"):
+                audio_queue.put_threadsafe(audio)
+
+        thread = threading.Thread(target=capture)
+        thread.start()
+        received = [self.run(audio_queue.get()) for _ in range(3)]
+        thread.join()
+        assert received == [b"a", b"b", b"c"]
+        assert audio_queue.dropped == 0
+
+    def test_block_stopped(self):
+        audio_queue = AudioQueue(1, BLOCK, self.loop)
+        audio_queue.put_nowait(b"a")
+        stopped = threading.Event()
+        results = []
+
+        def capture():
+            results.append(audio_queue.put_threadsafe(b"b", stopped))
+
+        # The queue is full and the loop does not run, like a loop thread
+        # closing the recorder after its consumer stopped
+        thread = threading.Thread(target=capture)
+        thread.start()
+        thread.join(0.3)
+        assert thread.is_alive()
+        stopped.set()
+        thread.join(2)
+        assert not thread.is_alive()
+        assert results == [False]
+        assert audio_queue.depth == 1
+
+    def test_bad_policy(self):
+        with pytest.raises(ValueError):
+            AudioQueue(2, "drop_all", self.loop)
+
+
+class UpperEncoder(object):
+    """Encode frames of 2 bytes in uppercase"""
+
+    def __init__(self):
+        self.pending = b""
+        self.threads = set()
+
+    def feed(self, chunk):
+        self.pending += chunk
+
+    def frames(self):
+        self.threads.add(threading.get_ident())
+        while len(self.pending) >= 2:
+            frame, self.pending = self.pending[:2], self.pending[2:]
+            yield frame, frame.upper()
+
+
+class Chunks(object):
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+
+    def __aiter__(self):
+        return self
+
+    @asyncio.coroutine
+    def __anext__(self):
+        if not self.chunks:
+            raise StopAsyncIteration
+        return self.chunks.pop(0)
+
+
+class TestEncoderStage(object):
+
+    def setup_method(self):
+        self.loop = asyncio.new_event_loop()
+
+    def teardown_method(self):
+        self.loop.close()
+
+    def test_run(self):
+        encoder = UpperEncoder()
+        stage = EncoderStage(encoder, loop=self.loop, maxsize=2)
+
+        @asyncio.coroutine
+        def consume():
+            task = asyncio.ensure_future(stage.run(Chunks([b"abc", b"def", b"g"])), loop=self.loop)
+            frames = []
+            while True:
+                frame = yield from stage.get()
+                if frame is None:
+                    break
+                frames.append(frame)
+            yield from task
+            return frames
+
+        frames = self.loop.run_until_complete(consume())
+        assert frames == [(b"ab", b"AB"), (b"cd", b"CD"), (b"ef", b"EF")]
+        assert threading.get_ident() not in encoder.threads
+        assert stage.timings["chunks"] == 3
@@ -6,6 +6,7 @@ import pytest
 
 from pynuance import cli
 from pynuance.__main__ import main
+from pynuance.libs.error import PyNuanceError
 
 MIX_READY = False
 
@@ -215,3 +216,23 @@ class TestUserHandling(object):
         out, err = capsys.readouterr()
         # Check it
         assert out == """Model "{}" deleted\n""".format(self.model_name)
+
+
+class TestReadTtsJobs(object):
+
+    def test_jobs(self, tmpdir):
+        input_file = tmpdir.join("prompts.txt")
+        input_file.write('Hello\n\n{"text": "Hi", "voice": "Tom"}\n')
+        assert cli._read_tts_jobs(str(input_file), "en_US", "Allison") == [
+            ("Hello", "Allison", "en_US"), ("Hi", "Tom", "en_US")]
+
+    def test_bad_lines(self, tmpdir):
+        input_file = tmpdir.join("prompts.txt")
+        input_file.write('Hello\n{"text": \n')
+        with pytest.raises(PyNuanceError) as error:
+            cli._read_tts_jobs(str(input_file), "en_US", "Allison")
+        assert ":2: bad JSON" in str(error.value)
+        input_file.write('{"voice": "Tom"}\n')
+        with pytest.raises(PyNuanceError) as error:
+            cli._read_tts_jobs(str(input_file), "en_US", "Allison")
+        assert ":1: missing text" in str(error.value)
@@ -0,0 +1,31 @@
+import subprocess
+import sys
+
+
+# Modules a CLI start must not import before a command needs them
+HEAVY_MODULES = ("aiohttp", "pyaudio", "speex", "opuslib", "requests", "bs4", "numpy",
+                 "pynuance.credentials", "pynuance.mix", "pynuance.nlu", "pynuance.tts",
+                 "pynuance.stt", "pynuance.recorder")
+
+
+def imported_modules(statement):
+    """Modules loaded by a fresh interpreter running `statement`"""
+    code = "import sys; {}; print('\\n'.join(sys.modules))".format(statement)
+    output = subprocess.check_output([sys.executable, "-c", code])
+    return set(output.decode().split())
+
+
+class TestImportTime(object):
+
+    def test_main_is_lazy(self):
+        modules = imported_modules("import pynuance.__main__")
+        assert modules.isdisjoint(HEAVY_MODULES)
+
+    def test_nlu_text_without_pyaudio(self):
+        modules = imported_modules("import pynuance.nlu")
+        assert "pyaudio" not in modules
+        assert "pynuance.recorder" not in modules
+
+    def test_stt_file_without_pyaudio(self):
+        modules = imported_modules("import pynuance.stt")
+        assert "pyaudio" not in modules
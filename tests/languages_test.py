@@ -0,0 +1,39 @@
+import pytest
+
+from pynuance.libs.error import PyNuanceError
+from pynuance.libs.languages import CATALOG
+
+
+class TestLanguageCatalog(object):
+
+    def test_language(self):
+        language = CATALOG.language("en_US")
+        assert language.name == "US English"
+        assert language.nlu_code == "eng-USA"
+        assert CATALOG.language_by_name("US English") is language
+        assert CATALOG.language("xx_XX") is None
+
+    def test_voices(self):
+        voices = CATALOG.voices("Allison")
+        assert [(voice.gender, voice.language) for voice in voices] == [("F", "en_US")]
+        assert len(CATALOG.voices("Ellen")) == 2
+        assert all(voice.gender == "M" for voice in CATALOG.voices_by_gender("M"))
+
+    def test_check_voice(self):
+        CATALOG.check_voice("en_US", "Tom")
+        with pytest.raises(PyNuanceError, match="Voice should be in Allison"):
+            CATALOG.check_voice("en_US", "Aurelie")
+        with pytest.raises(PyNuanceError, match="Language should be in"):
+            CATALOG.check_language("xx_XX")
+
+    def test_nlu_language(self):
+        assert CATALOG.nlu_language("fr_FR") == "fra-FRA"
+        assert CATALOG.nlu_language("ja_JP") == "jap-JPN"
+        with pytest.raises(PyNuanceError):
+            CATALOG.nlu_language("xx_XX")
+
+    def test_read_only(self):
+        language = CATALOG.language("en_US")
+        assert isinstance(language.voices, tuple)
+        with pytest.raises(AttributeError):
+            language.code = "xx_XX"
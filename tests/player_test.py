@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+pyaudio = pytest.importorskip("pyaudio")
+
+from pynuance.player import Player  # noqa: E402
+
+
+class BrokenStream(object):
+    """Output stream failing after `chunks` writes"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def write(self, chunk):
+        if not self.chunks:
+            raise OSError("Output underflowed")
+        self.chunks -= 1
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeAudio(object):
+
+    def __init__(self, stream=None):
+        self.stream = stream
+        self.terminated = False
+
+    def open(self, *args, **kwargs):
+        if self.stream is None:
+            raise OSError("Invalid output device")
+        return self.stream
+
+    def terminate(self):
+        self.terminated = True
+
+
+class TestPlayer(object):
+
+    def setup_method(self):
+        self.loop = asyncio.new_event_loop()
+
+    def teardown_method(self):
+        self.loop.close()
+
+    def player(self, audio, monkeypatch):
+        monkeypatch.setattr(pyaudio, "PyAudio", lambda: audio)
+        return Player(buffer_size=2, loop=self.loop)
+
+    def test_thread_error(self, monkeypatch):
+        player = self.player(FakeAudio(BrokenStream(1)), monkeypatch)
+
+        @asyncio.coroutine
+        def play():
+            # More chunks than the buffer holds once the thread failed
+            for _ in range(10):
+                yield from player.write(b"\0\0")
+
+        with player:
+            with pytest.raises(OSError):
+                self.loop.run_until_complete(asyncio.wait_for(play(), 5, loop=self.loop))
+            with pytest.raises(OSError):
+                self.loop.run_until_complete(asyncio.wait_for(player.drain(), 5,
+                                                              loop=self.loop))
+
+    def test_open_error(self, monkeypatch):
+        audio = FakeAudio()
+        player = self.player(audio, monkeypatch)
+        with pytest.raises(OSError):
+            with player:
+                pass
+        assert audio.terminated
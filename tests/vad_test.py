@@ -0,0 +1,68 @@
+import array
+import math
+import random
+
+from pynuance.libs.vad import EnergyVad
+
+
+FRAME_SAMPLES = 320  # 20 ms at 16 kHz
+
+
+def noise(duration_ms, level, seed=0):
+    rand = random.Random(seed)
+    samples = [int(rand.gauss(0, level)) for _ in range(16 * duration_ms)]
+    return array.array('h', samples).tobytes()
+
+
+def tone(duration_ms, amplitude, frequency=200):
+    samples = [int(amplitude * math.sin(2 * math.pi * frequency * i / 16000))
+               for i in range(16 * duration_ms)]
+    return array.array('h', samples).tobytes()
+
+
+def run(vad, audio):
+    """Feed 20 ms frames, return (result, end time in ms)"""
+    frame_bytes = FRAME_SAMPLES * 2
+    for index in range(len(audio) // frame_bytes):
+        result = vad.process(audio[index * frame_bytes:(index + 1) * frame_bytes])
+        if result is not None:
+            return result, (index + 1) * 20
+    return None, None
+
+
+class TestEnergyVad(object):
+
+    def test_end_of_speech(self):
+        audio = noise(300, 50) + tone(1000, 8000) + noise(1000, 50)
+        result, end_ms = run(EnergyVad(hangover_ms=400), audio)
+        assert result is True
+        assert 1700 <= end_ms <= 1760
+
+    def test_no_speech(self):
+        result, end_ms = run(EnergyVad(timeout_ms=1000), noise(3000, 50))
+        assert result is False
+        assert end_ms == 1000
+
+    def test_adaptive_noise_floor(self):
+        # The background noise is louder than the minimum level
+        audio = noise(500, 1500) + tone(1000, 15000) + noise(1500, 1500, seed=1)
+        result, end_ms = run(EnergyVad(), audio)
+        assert result is True
+        assert end_ms <= 2100
+
+    def test_speech_pauses(self):
+        # Pauses shorter than the hangover do not end the speech
+        audio = noise(200, 50)
+        for _ in range(3):
+            audio += tone(300, 8000) + noise(200, 50)
+        audio += noise(1000, 50)
+        result, end_ms = run(EnergyVad(hangover_ms=400), audio)
+        assert result is True
+        assert end_ms > 1700
+
+    def test_reset(self):
+        vad = EnergyVad(hangover_ms=200)
+        assert run(vad, noise(200, 50) + tone(200, 8000) + noise(400, 50))[0] is True
+        vad.reset()
+        assert vad.speaking is False
+        assert run(vad, tone(200, 8000) + noise(400, 50))[0] is True
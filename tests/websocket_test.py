@@ -0,0 +1,457 @@
+import array
+import asyncio
+import audioop
+import binascii
+import io
+import logging
+import math
+import wave
+
+import aiohttp
+import pytest
+
+from pynuance import nlu, stt, tts
+from pynuance.libs.audio_cache import AudioCache
+from pynuance.libs.clock_skew import ClockSkewCache
+from pynuance.libs.error import PyNuanceError
+from pynuance.libs.serializer import STDLIB_SERIALIZER
+from pynuance.testing import NuanceStubServer
+from pynuance.tts import (ParallelSynthesisStream, SynthesisStream, send_tts_query,
+                          split_sentences)
+from pynuance.websocket import (PrewarmedClient, WebsocketConnection, WebsocketPool,
+                                connect_client, create_session)
+
+
+LOGGER = logging.getLogger("pynuance").getChild("test")
+
+
+class TestStubServer(object):
+
+    def setup_method(self):
+        self.loop = asyncio.new_event_loop()
+        self.server = NuanceStubServer(seed=1, loop=self.loop)
+        self.loop.run_until_complete(self.server.start())
+        self.session = create_session(loop=self.loop)
+
+    def teardown_method(self):
+        self.session.close()
+        self.loop.run_until_complete(self.server.stop())
+        self.loop.close()
+
+    def run(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def synthesize(self, codec="wav", text="Hello", stream_class=SynthesisStream, **kwargs):
+        """Read all the chunks of a synthesis, return them with the stream"""
+        @asyncio.coroutine
+        def read():
+            synthesis = stream_class(self.server.url, self.server.app_id, self.server.app_key,
+                                     "en_US", "Allison", codec, text, LOGGER,
+                                     session=self.session, **kwargs)
+            chunks = []
+            while True:
+                chunk = yield from synthesis.read()
+                if chunk is None:
+                    break
+                chunks.append(chunk)
+            return chunks, synthesis
+
+        return self.run(read())
+
+    def test_nlu_text(self):
+        ret = self.run(nlu._nlu_text(self.server.url, self.server.app_id, self.server.app_key,
+                                     "tag", "turn on the light", "eng-USA", LOGGER,
+                                     session=self.session))
+        interpretation = ret['nlu_interpretation_results']['payload']['interpretations'][0]
+        assert interpretation['literal'] == "turn on the light"
+
+    def test_nlu_texts_pipelined(self):
+        texts = ["text {}".format(i) for i in range(5)]
+        rets = self.run(nlu._nlu_texts(self.server.url, self.server.app_id,
+                                       self.server.app_key, "tag", texts, "eng-USA", LOGGER,
+                                       session=self.session))
+        literals = [ret['nlu_interpretation_results']['payload']['interpretations'][0]['literal']
+                    for ret in rets]
+        assert literals == texts
+        assert self.server.stats["connections"] == 1
+
+    def test_tts_audio(self):
+        @asyncio.coroutine
+        def synthesize():
+            client = yield from connect_client(self.server.url, self.server.app_id,
+                                               self.server.app_key, 'audio/L16;rate=16000',
+                                               LOGGER, device_id="device", session=self.session)
+            transaction = send_tts_query(client, "eng-USA", "ava", "Hello")
+            audio = b""
+            while True:
+                chunk = yield from transaction.receive_audio()
+                if chunk is None:
+                    break
+                audio += chunk
+            messages = []
+            while not messages or messages[-1] != 'query_end':
+                msg = yield from transaction.receive_message()
+                messages.append(msg['message'])
+            client.close()
+            return audio, messages
+
+        audio, messages = self.run(synthesize())
+        assert len(audio) == self.server.audio_chunk_size * self.server.audio_chunks
+        assert messages == ['audio_begin', 'audio_end', 'query_end']
+
+    def test_hmac_clock_skew(self):
+        self.server.clock_skew = 60
+        clock_skew = ClockSkewCache()
+
+        @asyncio.coroutine
+        def connect():
+            client = WebsocketConnection(self.server.url, LOGGER, clock_skew=clock_skew,
+                                         session=self.session)
+            yield from client.connect(self.server.app_id, self.server.app_key,
+                                      use_plaintext=False)
+            client.close()
+
+        self.run(connect())
+        assert self.server.stats["rejected"] == 1
+        assert abs(clock_skew.get(self.server.url).total_seconds() - 60) < 5
+        # The cached delta signs the next connection right at the first request
+        self.run(connect())
+        assert self.server.stats["rejected"] == 1
+        assert self.server.stats["connections"] == 2
+
+    def test_pool_clock_skew_file(self, tmpdir):
+        self.server.clock_skew = 60
+        file_path = str(tmpdir.join("clock_skew.json"))
+        pool = WebsocketPool(session=self.session, clock_skew=ClockSkewCache(file_path))
+        client = self.run(pool.acquire(self.server.url, self.server.app_id,
+                                       self.server.app_key, 'audio/L16;rate=16000', LOGGER,
+                                       "device", use_plaintext=False))
+        pool.release(client)
+        pool.close()
+        assert self.server.stats["rejected"] == 1
+        # The delta is persisted for the next processes
+        delta = ClockSkewCache(file_path).get(self.server.url)
+        assert abs(delta.total_seconds() - 60) < 5
+
+    def test_key_authentication_failure(self):
+        @asyncio.coroutine
+        def connect():
+            yield from connect_client(self.server.url, self.server.app_id,
+                                      binascii.unhexlify("00"), 'audio/L16;rate=16000',
+                                      LOGGER, device_id="device", session=self.session)
+
+        with pytest.raises(RuntimeError) as error:
+            self.run(connect())
+        assert "Authorization failure" in str(error.value)
+        assert self.server.stats["rejected"] == 1
+        assert self.server.stats["connections"] == 0
+
+    def test_connect_client_cancelled(self, monkeypatch):
+        closed = []
+        close = WebsocketConnection.close
+
+        def record_close(client):
+            closed.append(client)
+            close(client)
+
+        monkeypatch.setattr(WebsocketConnection, "close", record_close)
+        # `connected` comes after the timeout
+        self.server.latency = 2
+
+        @asyncio.coroutine
+        def connect():
+            yield from connect_client(self.server.url, self.server.app_id,
+                                      self.server.app_key, 'audio/L16;rate=16000',
+                                      LOGGER, device_id="device", session=self.session)
+
+        with pytest.raises(asyncio.TimeoutError):
+            self.run(asyncio.wait_for(connect(), 0.5, loop=self.loop))
+        assert len(closed) == 1
+        assert closed[0].connection.closed
+        self.run(asyncio.sleep(0, loop=self.loop))
+        assert closed[0]._reader_task.done()
+
+    def test_write_audio_backpressure(self):
+        @asyncio.coroutine
+        def fill():
+            client = WebsocketConnection(self.server.url, LOGGER, session=self.session,
+                                         write_buffer_high=1024)
+            yield from client.connect(self.server.app_id, self.server.app_key)
+            yield from client.nuance_connect('audio/L16;rate=16000', "device")
+            self.server.pause_reading()
+            chunk = bytes(256 * 1024)
+            # Fill the socket buffers until the write buffer passes its high-water mark
+            for _ in range(200):
+                write = asyncio.ensure_future(client.write_audio(chunk), loop=self.loop)
+                yield from asyncio.sleep(0.05, loop=self.loop)
+                if not write.done():
+                    break
+            assert not write.done()
+            assert client.buffered_bytes > 1024
+            self.server.resume_reading()
+            yield from asyncio.wait_for(write, 10, loop=self.loop)
+            assert client.buffered_bytes <= 1024
+            client.close()
+
+        self.run(fill())
+
+    @asyncio.coroutine
+    def begin_recognition(self, delay):
+        yield from asyncio.sleep(delay, loop=self.loop)
+        return (yield from stt._begin_recognition(self.server.url, self.server.app_id,
+                                                  self.server.app_key, "eng-USA", LOGGER,
+                                                  session=self.session))
+
+    def test_prewarmed_client_flush(self):
+        self.server.record = True
+        frames = [bytes([index]) * 100 for index in range(5)]
+
+        @asyncio.coroutine
+        def recognize():
+            prewarmed = PrewarmedClient(self.begin_recognition(0.2), loop=self.loop)
+            for frame in frames[:3]:
+                yield from prewarmed.write_audio(frame)
+            # Still opening, the audio is buffered
+            assert prewarmed.client is None
+            client, transaction = yield from prewarmed.wait_ready()
+            for frame in frames[3:]:
+                yield from prewarmed.write_audio(frame)
+            assert not prewarmed.finished
+            msgs = yield from stt._end_recognition(client, transaction, LOGGER)
+            # Stops listen_microphone like the real transaction
+            assert prewarmed.finished
+            return msgs
+
+        msgs = self.run(recognize())
+        assert msgs[0]['audio_bytes'] == 500
+        messages = self.server.messages
+        handshake = [msg['message'] for msg in messages[:5]]
+        assert handshake == ['connect', 'query_begin', 'query_parameter', 'query_end', 'audio']
+        assert messages[5:10] == frames
+        assert messages[10]['message'] == 'audio_end'
+
+    def test_prewarmed_client_close_unused(self):
+        @asyncio.coroutine
+        def open_and_close():
+            prewarmed = PrewarmedClient(self.begin_recognition(0), loop=self.loop)
+            client, _ = yield from asyncio.shield(prewarmed.begin_task, loop=self.loop)
+            # The query was opened but the microphone failed before wait_ready
+            prewarmed.close()
+            return client
+
+        client = self.run(open_and_close())
+        assert client.connection is None or client.connection.closed
+
+    def test_pool_reuse(self):
+        pool = WebsocketPool(session=self.session)
+        for text in ("first", "second", "third"):
+            self.run(nlu._nlu_text(self.server.url, self.server.app_id, self.server.app_key,
+                                   "tag", text, "eng-USA", LOGGER, pool=pool))
+        pool.close()
+        assert self.server.stats["connections"] == 1
+        assert self.server.stats["queries"] == 3
+
+    def test_pool_key(self):
+        pool = WebsocketPool(session=self.session)
+
+        @asyncio.coroutine
+        def acquire_release(device_id, user_id):
+            client = yield from pool.acquire(self.server.url, self.server.app_id,
+                                             self.server.app_key, 'audio/x-speex;mode=wb',
+                                             LOGGER, device_id, user_id)
+            pool.release(client)
+            return client
+
+        tts_client = self.run(acquire_release("tts_device", "tts_user"))
+        stt_client = self.run(acquire_release("stt_device", "stt_user"))
+        assert stt_client is not tts_client
+        assert self.run(acquire_release("tts_device", "tts_user")) is tts_client
+        pool.close()
+        assert self.server.stats["connections"] == 2
+
+    def test_pool_max_connections(self):
+        pool = WebsocketPool(session=self.session, max_connections=1)
+
+        def acquire():
+            return pool.acquire(self.server.url, self.server.app_id, self.server.app_key,
+                                'audio/L16;rate=16000', LOGGER, "device")
+
+        @asyncio.coroutine
+        def burst():
+            first = yield from acquire()
+            second = asyncio.ensure_future(acquire(), loop=self.loop)
+            yield from asyncio.sleep(0.1, loop=self.loop)
+            # Waits for the in-use connection
+            assert not second.done()
+            pool.release(first)
+            second = yield from second
+            assert second is first
+            # Closing a connection frees its slot too
+            second.close()
+            third = yield from asyncio.wait_for(acquire(), 5, loop=self.loop)
+            pool.release(third)
+
+        self.run(burst())
+        pool.close()
+        assert self.server.stats["connections"] == 2
+
+    def test_pool_max_connections_error(self):
+        pool = WebsocketPool(session=self.session, max_connections=1)
+
+        def understand():
+            return nlu._nlu_text(self.server.url, self.server.app_id, self.server.app_key,
+                                 "tag", "hello", "eng-USA", LOGGER, pool=pool)
+
+        self.server.disconnect_rate = 1
+        with pytest.raises(aiohttp.errors.ServerDisconnectedError):
+            self.run(understand())
+        # The failed query gave its slot back
+        self.server.disconnect_rate = 0
+        ret = self.run(asyncio.wait_for(understand(), 5, loop=self.loop))
+        pool.close()
+        interpretation = ret['nlu_interpretation_results']['payload']['interpretations'][0]
+        assert interpretation['literal'] == "hello"
+
+    def test_stdlib_serializer(self):
+        pool = WebsocketPool(session=self.session, serializer=STDLIB_SERIALIZER)
+        ret = self.run(nlu._nlu_text(self.server.url, self.server.app_id, self.server.app_key,
+                                     "tag", "hello", "eng-USA", LOGGER, pool=pool))
+        pool.close()
+        interpretation = ret['nlu_interpretation_results']['payload']['interpretations'][0]
+        assert interpretation['literal'] == "hello"
+
+    def test_synthesis_stream(self):
+        chunks, synthesis = self.synthesize()
+        assert len(chunks) == self.server.audio_chunks
+        assert synthesis.done
+
+    def test_synthesis_cache(self):
+        cache = AudioCache()
+        first, _ = self.synthesize(cache=cache)
+        second, _ = self.synthesize(cache=cache)
+        assert b"".join(first) == b"".join(second)
+        assert self.server.stats["queries"] == 1
+        assert cache.stats["memory_hits"] == 1
+
+    def test_synthesis_error(self):
+        self.server.error_rate = 1
+        cache = AudioCache()
+        synthesis = SynthesisStream(self.server.url, self.server.app_id,
+                                    self.server.app_key, "en_US", "Allison", "wav",
+                                    "Hello", LOGGER, session=self.session, cache=cache)
+        with pytest.raises(PyNuanceError):
+            self.run(synthesis.read())
+        assert synthesis.done
+        assert synthesis.client.connection.closed
+        assert cache.get(synthesis.cache_key) is None
+
+    def test_synthesis_adpcm(self):
+        pcm = bytes(range(256)) * 10
+        adpcm, _ = audioop.lin2adpcm(pcm, 2, None)
+        self.server.audio_frames = [adpcm[:320], adpcm[320:]]
+        chunks, _ = self.synthesize("adpcm")
+        assert b"".join(chunks) == audioop.adpcm2lin(adpcm, 2, None)[0]
+
+    def test_synthesis_opus(self):
+        opus = pytest.importorskip("opuslib.api")
+        # 20 ms of a 440 Hz tone
+        pcm = array.array('h', [int(8000 * math.sin(2 * math.pi * 440 * i / 16000))
+                                for i in range(320)]).tobytes()
+        encoder = opus.encoder.create_state(16000, 1, 2048)
+        tone = opus.encoder.encode(encoder, pcm, 320, 1000)
+        # Opus silence frame, 20 ms
+        silence = b"\xf8\xff\xfe"
+        self.server.audio_frames = [silence, tone]
+        chunks, _ = self.synthesize("opus")
+        assert [len(chunk) for chunk in chunks] == [640, 640]
+        assert audioop.rms(chunks[0], 2) == 0
+        assert audioop.rms(chunks[1], 2) > 500
+
+    def test_split_sentences(self):
+        assert split_sentences(" Hello world. How are you?  Fine!\nBye ") == [
+            "Hello world.", "How are you?", "Fine!", "Bye"]
+
+    def test_parallel_synthesis(self):
+        self.server.latency = 0.05
+        self.server.jitter = 0.04
+        chunks, _ = self.synthesize(text="One. Two. Three.",
+                                    stream_class=ParallelSynthesisStream, parallelism=3)
+        assert len(chunks) == 3 * self.server.audio_chunks
+        # The audio follows the order of the text, whatever query answered first
+        expected = [frame for text in ("One.", "Two.", "Three.")
+                    for frame in self.server.tts_frames(text)]
+        assert chunks == expected
+        assert self.server.stats["queries"] == 3
+        assert self.server.stats["connections"] == 3
+
+    def test_recognize_stream(self):
+        pcm = io.BytesIO(bytes(16000 * 2))
+        chunks = stt._FileChunks(lambda: pcm.read(4096))
+        msgs = self.run(stt.do_recognize_stream(self.server.url, self.server.app_id,
+                                                self.server.app_key, "en_US", chunks, 16000, 1,
+                                                LOGGER, session=self.session))
+        assert msgs[0]['transcriptions'] == ['stub transcription']
+        assert msgs[0]['audio_bytes'] > 0
+
+    def test_recognize_file_8khz(self, tmpdir, monkeypatch):
+        monkeypatch.setattr(stt, "URL", self.server.url)
+        self.server.record = True
+        file_path = str(tmpdir.join("call.wav"))
+        with wave.open(file_path, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(8000)
+            wav_file.writeframes(bytes(8000 * 2))
+        app_key = binascii.hexlify(self.server.app_key).decode()
+        msgs = self.run(stt.async_recognize_file(self.server.app_id, app_key, "en_US",
+                                                 file_path, logger=LOGGER,
+                                                 session=self.session))
+        assert msgs[0]['transcriptions'] == ['stub transcription']
+        # 1 s and the 100 ms flush in 20 ms wide band frames, not sped up twice
+        frames = [msg for msg in self.server.messages if isinstance(msg, bytes)]
+        assert 45 <= len(frames) <= 55
+
+    def test_synthesize_batch(self, tmpdir, monkeypatch):
+        monkeypatch.setattr(tts, "URL", self.server.url)
+        app_key = binascii.hexlify(self.server.app_key).decode()
+        jobs = [("Hello", "Allison", "en_US"),
+                ("Bad voice", "Nobody", "en_US"),
+                ("Bye", "Tom", "en_US")]
+        results = self.run(tts.async_synthesize_batch(self.server.app_id, app_key, "wav", jobs,
+                                                      str(tmpdir), concurrency=2, logger=LOGGER,
+                                                      session=self.session))
+        assert [result["text"] for result in results] == ["Hello", "Bad voice", "Bye"]
+        assert "error" not in results[0]
+        assert "error" in results[1]
+        assert "error" not in results[2]
+        assert results[2]["file"] == str(tmpdir.join("00002.wav"))
+        with wave.open(results[0]["file"]) as wav_file:
+            assert wav_file.getnframes() * 2 == (self.server.audio_chunk_size *
+                                                 self.server.audio_chunks)
+        assert self.server.stats["queries"] == 2
+
+    def test_synthesize_batch_error(self, tmpdir, monkeypatch):
+        monkeypatch.setattr(tts, "URL", self.server.url)
+        self.server.error_rate = 1
+        app_key = binascii.hexlify(self.server.app_key).decode()
+        results = self.run(tts.async_synthesize_batch(self.server.app_id, app_key, "wav",
+                                                      [("Hello", "Allison", "en_US")],
+                                                      str(tmpdir), logger=LOGGER,
+                                                      session=self.session))
+        assert "error" in results[0]
+        assert not tmpdir.join("00000.wav").check()
+        assert self.server.stats["errors"] == 1
+
+    def test_synthesize_batch_bad_jobs(self, tmpdir, monkeypatch):
+        monkeypatch.setattr(tts, "URL", self.server.url)
+        app_key = binascii.hexlify(self.server.app_key).decode()
+
+        def jobs():
+            yield ("Hello", "Allison", "en_US")
+            raise ValueError("bad job")
+
+        with pytest.raises(ValueError):
+            self.run(tts.async_synthesize_batch(self.server.app_id, app_key, "wav", jobs(),
+                                                str(tmpdir), logger=LOGGER,
+                                                session=self.session))
+        assert self.server.stats["queries"] == 0